@@ -1,17 +1,24 @@
 """
 Authentication API endpoints.
 """
+import asyncio
 from datetime import timedelta
 from typing import Dict
 
 import structlog
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.auth import auth_service
-from app.auth.dependencies import get_current_user, rate_limit_check
+from app.auth.dependencies import (
+    get_current_user,
+    invalidate_user_tokens,
+    rate_limit_check,
+)
 from app.core.config import settings
 from app.core.database import get_db
+from app.middleware.enhanced_security import get_client_ip
 from app.models.user import User
 from app.schemas.auth import (
     EmailVerificationRequest,
@@ -31,6 +38,43 @@ logger = structlog.get_logger(__name__)
 
 router = APIRouter()
 
+# Statements are built once at import rather than per request
+_DEACTIVATE_SESSIONS_STMT = text(
+    "UPDATE user_sessions SET is_active = FALSE WHERE user_id = :user_id"
+)
+_UPDATE_PASSWORD_STMT = text(
+    "UPDATE users SET password_hash = :password_hash, updated_at = NOW() WHERE id = :user_id"
+)
+_VERIFY_EMAIL_STMT = text(
+    "UPDATE users SET email_verified = TRUE, updated_at = NOW() WHERE id = :user_id"
+)
+_QUEUE_WELCOME_EMAIL_STMT = text("""
+    INSERT INTO email_queue (
+        template_id, to_email, to_name, from_email, from_name,
+        subject, template_variables, user_id
+    )
+    SELECT
+        et.id, :email, :name, 'noreply@loctician.dk', 'Loctician',
+        'Welcome - Please Verify Your Email',
+        CAST(:variables AS jsonb), :user_id
+    FROM email_templates et
+    WHERE et.template_type = 'welcome' AND et.is_active = TRUE
+    LIMIT 1
+""")
+_QUEUE_PASSWORD_RESET_EMAIL_STMT = text("""
+    INSERT INTO email_queue (
+        template_id, to_email, to_name, from_email, from_name,
+        subject, template_variables, user_id
+    )
+    SELECT
+        et.id, :email, :name, 'noreply@loctician.dk', 'Loctician',
+        'Password Reset Request',
+        CAST(:variables AS jsonb), :user_id
+    FROM email_templates et
+    WHERE et.template_type = 'password_reset' AND et.is_active = TRUE
+    LIMIT 1
+""")
+
 
 @router.post("/login", response_model=LoginResponse, status_code=status.HTTP_200_OK)
 async def login(
@@ -46,11 +90,7 @@ async def login(
     with built-in rate limiting and security checks.
     """
     # Get client IP and user agent
-    client_ip = request.client.host
-    if "x-forwarded-for" in request.headers:
-        client_ip = request.headers["x-forwarded-for"].split(",")[0].strip()
-    elif "x-real-ip" in request.headers:
-        client_ip = request.headers["x-real-ip"]
+    client_ip = get_client_ip(request.scope)
 
     user_agent = request.headers.get("user-agent", "Unknown")
 
@@ -116,15 +156,16 @@ async def register(
     The user account will be created but email_verified will be False until verified.
     """
     # Get client IP for audit logging
-    client_ip = request.client.host
-    if "x-forwarded-for" in request.headers:
-        client_ip = request.headers["x-forwarded-for"].split(",")[0].strip()
-    elif "x-real-ip" in request.headers:
-        client_ip = request.headers["x-real-ip"]
+    client_ip = get_client_ip(request.scope)
 
     try:
-        # Check if email is available
-        if not await auth_service.is_email_available(db, registration_data.email):
+        # Check email availability while the password hashes in a worker
+        # thread, so the lookup round-trip overlaps the bcrypt work
+        email_available, password_hash = await asyncio.gather(
+            auth_service.is_email_available(db, registration_data.email),
+            auth_service.hash_password(registration_data.password),
+        )
+        if not email_available:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this email already exists"
@@ -140,7 +181,8 @@ async def register(
             phone=registration_data.phone,
             role=registration_data.role,
             marketing_consent=registration_data.marketing_consent,
-            email_verified=False
+            email_verified=False,
+            password_hash=password_hash
         )
 
         # Generate email verification token
@@ -149,21 +191,9 @@ async def register(
             expires_delta=timedelta(hours=24)
         )
 
-        # Queue verification email
+        # Queue verification email in the same transaction as the new user
         await db.execute(
-            """
-            INSERT INTO email_queue (
-                template_id, to_email, to_name, from_email, from_name,
-                subject, template_variables, user_id
-            )
-            SELECT
-                et.id, :email, :name, 'noreply@loctician.dk', 'Loctician',
-                'Welcome - Please Verify Your Email',
-                :variables::jsonb, :user_id
-            FROM email_templates et
-            WHERE et.template_type = 'welcome' AND et.is_active = TRUE
-            LIMIT 1
-            """,
+            _QUEUE_WELCOME_EMAIL_STMT,
             {
                 "email": registration_data.email,
                 "name": f"{registration_data.first_name} {registration_data.last_name}",
@@ -243,11 +273,9 @@ async def logout(
     """
     try:
         # Invalidate all user sessions in database
-        await db.execute(
-            "UPDATE user_sessions SET is_active = FALSE WHERE user_id = :user_id",
-            {"user_id": current_user.id}
-        )
+        await db.execute(_DEACTIVATE_SESSIONS_STMT, {"user_id": current_user.id})
         await db.commit()
+        invalidate_user_tokens(current_user.id)
 
         logger.info("User logged out", user_id=current_user.id)
 
@@ -285,17 +313,15 @@ async def change_password(
 
         # Update password in database
         await db.execute(
-            "UPDATE users SET password_hash = :password_hash, updated_at = NOW() WHERE id = :user_id",
+            _UPDATE_PASSWORD_STMT,
             {"password_hash": new_password_hash, "user_id": current_user.id}
         )
 
         # Invalidate all sessions except current one
-        await db.execute(
-            "UPDATE user_sessions SET is_active = FALSE WHERE user_id = :user_id",
-            {"user_id": current_user.id}
-        )
+        await db.execute(_DEACTIVATE_SESSIONS_STMT, {"user_id": current_user.id})
 
         await db.commit()
+        invalidate_user_tokens(current_user.id)
 
         logger.info("Password changed successfully", user_id=current_user.id)
 
@@ -333,19 +359,7 @@ async def request_password_reset(
 
             # Queue password reset email
             await db.execute(
-                """
-                INSERT INTO email_queue (
-                    template_id, to_email, to_name, from_email, from_name,
-                    subject, template_variables, user_id
-                )
-                SELECT
-                    et.id, :email, :name, 'noreply@loctician.dk', 'Loctician',
-                    'Password Reset Request',
-                    :variables::jsonb, :user_id
-                FROM email_templates et
-                WHERE et.template_type = 'password_reset' AND et.is_active = TRUE
-                LIMIT 1
-                """,
+                _QUEUE_PASSWORD_RESET_EMAIL_STMT,
                 {
                     "email": user.email,
                     "name": user.full_name,
@@ -398,17 +412,15 @@ async def reset_password(
 
         # Update password
         await db.execute(
-            "UPDATE users SET password_hash = :password_hash, updated_at = NOW() WHERE id = :user_id",
+            _UPDATE_PASSWORD_STMT,
             {"password_hash": new_password_hash, "user_id": user_id}
         )
 
         # Invalidate all user sessions
-        await db.execute(
-            "UPDATE user_sessions SET is_active = FALSE WHERE user_id = :user_id",
-            {"user_id": user_id}
-        )
+        await db.execute(_DEACTIVATE_SESSIONS_STMT, {"user_id": user_id})
 
         await db.commit()
+        invalidate_user_tokens(user_id)
 
         logger.info("Password reset successfully", user_id=user_id)
 
@@ -450,11 +462,9 @@ async def verify_email(
             )
 
         # Update email verification status
-        await db.execute(
-            "UPDATE users SET email_verified = TRUE, updated_at = NOW() WHERE id = :user_id",
-            {"user_id": user_id}
-        )
+        await db.execute(_VERIFY_EMAIL_STMT, {"user_id": user_id})
         await db.commit()
+        invalidate_user_tokens(user_id)
 
         logger.info("Email verified successfully", user_id=user_id)
 
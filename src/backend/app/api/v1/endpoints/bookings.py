@@ -84,7 +84,7 @@ async def create_booking(
             error_message = booking_result.get("message", "Booking creation failed")
 
             # Map database errors to HTTP status codes
-            if error_code == "TIME_UNAVAILABLE":
+            if error_code in ("TIME_UNAVAILABLE", "BOOKING_CONFLICT"):
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
                     detail=error_message
@@ -107,7 +107,7 @@ async def create_payment_intent(
                 )
 
         # Create URLs
-        base_url = settings.BACKEND_CORS_ORIGINS[0] if settings.BACKEND_CORS_ORIGINS else "http://localhost:8000"
+        base_url = settings.cors_origins_list[0] if settings.BACKEND_CORS_ORIGINS else "http://localhost:8000"
         webhook_url = f"{base_url}/api/v1/payments/webhook"
         redirect_url = f"{base_url}/payment/success"
 
@@ -504,7 +504,7 @@ async def create_subscription(
             trial_ends_at = starts_at + timedelta(days=trial_days)
 
         # Create subscription with Mollie
-        webhook_url = f"{settings.BACKEND_CORS_ORIGINS[0]}/api/v1/payments/webhook"
+        webhook_url = f"{settings.cors_origins_list[0]}/api/v1/payments/webhook"
 
         subscription_mollie_data = MollieSubscriptionCreate(
             amount=mollie_service.create_amount(amount, "DKK"),
@@ -257,8 +257,8 @@ async def create_payment_intent(
                 )
 
         # Create webhook URL
-        webhook_url = f"{settings.BACKEND_CORS_ORIGINS[0]}/api/v1/payments/webhook"
-        redirect_url = f"{settings.BACKEND_CORS_ORIGINS[0]}/payment/success"
+        webhook_url = f"{settings.cors_origins_list[0]}/api/v1/payments/webhook"
+        redirect_url = f"{settings.cors_origins_list[0]}/payment/success"
 
         # Prepare metadata
         metadata = {
@@ -419,7 +419,7 @@ async def create_subscription(
         interval = "1 month" if subscription_data.billing_period == BillingPeriod.MONTHLY else "1 year"
 
         # Create subscription with Molly
-        webhook_url = f"{settings.BACKEND_CORS_ORIGINS[0]}/api/v1/payments/webhook"
+        webhook_url = f"{settings.cors_origins_list[0]}/api/v1/payments/webhook"
 
         molly_subscription = await molly_service.create_subscription(
             amount=amount,
@@ -9,8 +9,13 @@ from sqlalchemy import and_, func, or_, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.auth.dependencies import get_current_admin, get_current_user, rate_limit_check
-from app.core.database import get_db
+from app.auth.dependencies import (
+    get_current_admin,
+    get_current_user,
+    rate_limit_check,
+    rate_limit_check_ro,
+)
+from app.core.database import get_db, get_db_ro
 from app.models.service import Service, ServiceCategory
 from app.models.user import User
 from app.schemas.service import (
@@ -36,7 +41,7 @@ router = APIRouter()
 @router.get("/categories", response_model=List[ServiceCategoryWithServices])
 async def list_service_categories(
     include_inactive: bool = Query(False, description="Include inactive categories"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_ro),
 ) -> List[ServiceCategoryWithServices]:
     """List all service categories with their services."""
     try:
@@ -114,7 +119,7 @@ async def create_service_category(
 @router.get("/categories/{category_id}", response_model=ServiceCategoryWithServices)
 async def get_service_category(
     category_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_ro),
 ) -> ServiceCategoryWithServices:
     """Get service category by ID."""
     try:
@@ -264,7 +269,7 @@ async def list_services(
     include_non_bookable: bool = Query(False, description="Include non-bookable services"),
     limit: int = Query(100, le=1000, description="Limit results"),
     offset: int = Query(0, ge=0, description="Offset for pagination"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_ro),
 ) -> List[ServiceSummary]:
     """List services with filtering options."""
     try:
@@ -389,7 +394,7 @@ async def create_service(
 @router.get("/{service_id}", response_model=ServiceSchema)
 async def get_service(
     service_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_ro),
 ) -> ServiceSchema:
     """Get service by ID."""
     try:
@@ -576,8 +581,8 @@ async def search_services(
     q: str = Query(..., min_length=1, description="Search query"),
     category_id: Optional[str] = Query(None, description="Filter by category"),
     limit: int = Query(50, le=100, description="Limit results"),
-    db: AsyncSession = Depends(get_db),
-    _: None = Depends(rate_limit_check),
+    db: AsyncSession = Depends(get_db_ro),
+    _: None = Depends(rate_limit_check_ro),
 ) -> List[ServiceSearch]:
     """Search services using PostgreSQL full-text search."""
     try:
@@ -9,7 +9,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.dependencies import get_current_admin, get_current_staff_or_admin, get_current_user
+from app.auth.dependencies import (
+    get_current_admin,
+    get_current_staff_or_admin,
+    get_current_user,
+    invalidate_user_tokens,
+)
 from app.core.database import get_db
 from app.models.enums import UserRole, UserStatus
 from app.models.user import User
@@ -289,6 +294,7 @@ async def update_user_role(
             {"new_role": new_role.value, "user_id": user_id}
         )
         await db.commit()
+        invalidate_user_tokens(user_id)
 
         # Return updated user
         updated_user = await get_user_by_id(user_id, db, current_user)
@@ -362,6 +368,7 @@ async def update_user_status(
             )
 
         await db.commit()
+        invalidate_user_tokens(user_id)
 
         # Return updated user
         updated_user = await get_user_by_id(user_id, db, current_user)
@@ -436,6 +443,7 @@ async def delete_user(
         )
 
         await db.commit()
+        invalidate_user_tokens(user_id)
 
         logger.info(
             "User deleted",
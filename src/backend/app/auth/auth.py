@@ -1,15 +1,26 @@
 """
 Authentication utilities and JWT handling.
 """
+import asyncio
+import binascii
+import hashlib
+import hmac
 import json
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Union
+import time
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional, Union
 
+import bcrypt
+import orjson
 import structlog
 from fastapi import HTTPException, status
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError, jwk, jwt
+from jose.exceptions import ExpiredSignatureError, JOSEError, JWTClaimsError
+from jose.utils import base64url_decode, base64url_encode
 from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import class_mapper
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
@@ -18,8 +29,62 @@ from app.models.enums import UserRole, UserStatus
 
 logger = structlog.get_logger(__name__)
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost for new password hashes; calibrate_bcrypt_rounds() tunes it at
+# startup. Existing hashes carry their own cost and verify regardless.
+_bcrypt_rounds = 12
+
+
+def _password_bytes(password: str) -> bytes:
+    """Encode a password for bcrypt, which only uses the first 72 bytes."""
+    return password.encode("utf-8")[:72]
+
+
+def calibrate_bcrypt_rounds() -> int:
+    """
+    Pick the bcrypt cost for new hashes based on this machine's speed.
+
+    Benchmarks one hash per cost between BCRYPT_MIN_ROUNDS and
+    BCRYPT_MAX_ROUNDS and keeps the largest cost that stays within
+    BCRYPT_TARGET_MS. The result never drops below BCRYPT_MIN_ROUNDS, however
+    slow the host. Runs once at startup, not per request.
+
+    Returns:
+        int: The selected number of rounds
+    """
+    global _bcrypt_rounds
+
+    rounds = settings.BCRYPT_MIN_ROUNDS
+    for candidate in range(settings.BCRYPT_MIN_ROUNDS, settings.BCRYPT_MAX_ROUNDS + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(candidate))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if elapsed_ms > settings.BCRYPT_TARGET_MS and candidate > settings.BCRYPT_MIN_ROUNDS:
+            break
+        rounds = candidate
+        # Each extra round doubles the cost; stop before overshooting.
+        if elapsed_ms * 2 > settings.BCRYPT_TARGET_MS:
+            break
+
+    # Only ever raise the cost, never weaken it below the configured floor
+    rounds = max(rounds, settings.BCRYPT_MIN_ROUNDS)
+    _bcrypt_rounds = rounds
+    logger.info("Calibrated bcrypt cost", rounds=rounds, target_ms=settings.BCRYPT_TARGET_MS)
+    return rounds
+
+
+def user_from_mapping(values: Mapping[str, Any]) -> User:
+    """
+    Build a User from a column-name -> value mapping (e.g. a row's _mapping).
+
+    Fills the instance ``__dict__`` directly instead of going through the
+    instrumented attribute setters, so no change history is recorded for
+    values that simply mirror the database row.
+    """
+    # class_mapper() makes sure mappers are configured before bypassing __init__
+    user = class_mapper(User).class_manager.new_instance()
+    user.__dict__.update(values)
+    return user
 
 
 class AuthenticationError(HTTPException):
@@ -33,18 +98,167 @@ class AuthenticationError(HTTPException):
         )
 
 
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+# HMAC state keyed with SECRET_KEY, built once at import. Signing copies the
+# precomputed inner/outer pads instead of re-deriving them for every token.
+# Non-HMAC algorithms fall back to python-jose.
+_SIGNING_MAC: Optional[hmac.HMAC] = (
+    hmac.new(settings.SECRET_KEY.encode(), digestmod=_HMAC_DIGESTS[settings.ALGORITHM])
+    if settings.ALGORITHM in _HMAC_DIGESTS
+    else None
+)
+_TOKEN_HEADER_B64 = base64url_encode(
+    json.dumps(
+        {"alg": settings.ALGORITHM, "typ": "JWT"}, separators=(",", ":"), sort_keys=True
+    ).encode()
+).decode("ascii")
+
+_ACCESS_TOKEN_TTL_SECONDS = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+_REFRESH_TOKEN_TTL_SECONDS = settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+
+def _sign(signing_input: bytes) -> bytes:
+    """Compute the HMAC signature for ``header_b64.payload_b64``."""
+    mac = _SIGNING_MAC.copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+def _encode_token(claims: Dict[str, Any]) -> str:
+    """Encode and sign a claims set as a compact JWT."""
+    if _SIGNING_MAC is None:
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+    payload_b64 = base64url_encode(orjson.dumps(claims)).decode("ascii")
+    signing_input = f"{_TOKEN_HEADER_B64}.{payload_b64}".encode("ascii")
+    signature_b64 = base64url_encode(_sign(signing_input)).decode("ascii")
+    return f"{_TOKEN_HEADER_B64}.{payload_b64}.{signature_b64}"
+
+
+@lru_cache(maxsize=1)
+def _verification_key() -> Any:
+    """
+    Construct the python-jose key for non-HMAC algorithms once.
+
+    jwk.construct() parses SECRET_KEY (a PEM for RSA/EC) into a
+    cryptography key object; doing that per request is pure overhead.
+    """
+    return jwk.construct(settings.SECRET_KEY, settings.ALGORITHM)
+
+
+def _decode_segment(segment: str) -> Any:
+    """Base64url-decode and JSON-parse a single JWT segment."""
+    try:
+        return orjson.loads(base64url_decode(segment.encode("ascii")))
+    except (UnicodeError, binascii.Error, ValueError) as e:
+        raise JWTError(f"Invalid token segment: {e}")
+
+
+# Columns hydrated onto User objects for authentication. Address, date of
+# birth and retention fields are never read through these lookups, so they
+# are not fetched for every authenticated request.
+_AUTH_USER_COLUMNS = (
+    "id, email, email_verified, phone, password_hash, role, status, "
+    "first_name, last_name, country, preferred_language, timezone, "
+    "marketing_consent, created_at, updated_at, deleted_at, last_login_at"
+)
+
+# Static statements are built once at import; text() parses bind parameters
+# on construction, so there is no need to redo that on every call. The
+# asyncpg dialect keeps a per-connection prepared statement cache keyed on
+# the SQL string, so reusing these also reuses the server-side plan.
+_AUTHENTICATE_STMT = text(
+    "SELECT authenticate_user(:email, :password, :ip_address, :user_agent)"
+)
+_VALIDATE_SESSION_STMT = text("SELECT validate_session(:session_token)")
+_RATE_LIMIT_STMT = text(
+    "SELECT check_rate_limit(:endpoint, :ip_address, :user_id, :limit, :window_minutes)"
+)
+_USER_BY_ID_STMT = text(
+    f"SELECT {_AUTH_USER_COLUMNS} FROM users "
+    "WHERE id = :user_id AND status = 'active' AND deleted_at IS NULL"
+)
+_USER_BY_EMAIL_STMT = text(
+    f"SELECT {_AUTH_USER_COLUMNS} FROM users "
+    "WHERE email = :email AND status = 'active' AND deleted_at IS NULL"
+)
+_EMAIL_EXISTS_STMT = text(
+    "SELECT EXISTS(SELECT 1 FROM users WHERE email = :email AND deleted_at IS NULL)"
+)
+_CREATE_USER_STMT = text("""
+    INSERT INTO users (
+        email, password_hash, first_name, last_name, phone, role,
+        email_verified, marketing_consent, gdpr_consent_date,
+        gdpr_consent_version, country, preferred_language, timezone, status
+    )
+    VALUES (
+        :email, :password_hash, :first_name, :last_name, :phone, :role,
+        :email_verified, :marketing_consent, NOW(), '1.0',
+        'DK', 'da', 'Europe/Copenhagen', 'active'
+    )
+    RETURNING id
+""")
+
+
+# authenticate_user() error codes that are the caller's fault and are passed
+# through with their message; any other code is reported as a system error.
+_AUTH_ERROR_STATUS = {
+    "ACCOUNT_LOCKED": status.HTTP_423_LOCKED,
+    "INVALID_CREDENTIALS": status.HTTP_401_UNAUTHORIZED,
+}
+
+
+def _load_db_json(value: Any) -> Any:
+    """
+    Decode a JSON result returned by one of the PostgreSQL functions.
+
+    json/jsonb results are already decoded by the driver codec and pass
+    straight through; only functions declared to return text need parsing.
+    """
+    if not isinstance(value, (str, bytes)):
+        return value
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        # orjson is stricter than the stdlib (e.g. NaN); keep the old behaviour.
+        return json.loads(value)
+
+
 class AuthService:
     """Authentication service integrating with PostgreSQL security functions."""
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash."""
-        return pwd_context.verify(plain_password, hashed_password)
+        try:
+            return bcrypt.checkpw(
+                _password_bytes(plain_password), hashed_password.encode("utf-8")
+            )
+        except ValueError:
+            # Malformed or non-bcrypt hash
+            return False
 
     @staticmethod
     def get_password_hash(password: str) -> str:
         """Hash a password."""
-        return pwd_context.hash(password)
+        return bcrypt.hashpw(
+            _password_bytes(password), bcrypt.gensalt(_bcrypt_rounds)
+        ).decode("utf-8")
+
+    @staticmethod
+    async def hash_password(password: str) -> str:
+        """
+        Hash a password in a worker thread.
+
+        bcrypt holds the CPU for ~100ms by design; running it off the event
+        loop lets other requests (and concurrent queries for this one) proceed.
+        """
+        return await asyncio.to_thread(AuthService.get_password_hash, password)
 
     @staticmethod
     def create_access_token(
@@ -52,58 +266,126 @@ class AuthService:
     ) -> str:
         """Create JWT access token."""
         to_encode = data.copy()
+        now = int(time.time())
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expire = now + int(expires_delta.total_seconds())
         else:
-            expire = datetime.utcnow() + timedelta(
-                minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-            )
+            expire = now + _ACCESS_TOKEN_TTL_SECONDS
 
+        # Integer epoch seconds avoid jose's datetime -> NumericDate conversion.
         to_encode.update({
             "exp": expire,
-            "iat": datetime.utcnow(),
+            "iat": now,
             "type": "access"
         })
 
-        encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-        )
-        return encoded_jwt
+        return _encode_token(to_encode)
 
     @staticmethod
     def create_refresh_token(data: Dict[str, Any]) -> str:
         """Create JWT refresh token."""
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        now = int(time.time())
+        expire = now + _REFRESH_TOKEN_TTL_SECONDS
 
         to_encode.update({
             "exp": expire,
-            "iat": datetime.utcnow(),
+            "iat": now,
             "type": "refresh"
         })
 
-        encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-        )
-        return encoded_jwt
+        return _encode_token(to_encode)
 
     @staticmethod
     def verify_token(token: str, token_type: str = "access") -> Dict[str, Any]:
         """Verify and decode JWT token."""
         try:
-            payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-            )
+            # Split the token once and reuse the segments for the header,
+            # signature and claims instead of letting each step re-parse it.
+            segments = token.split(".")
+            if len(segments) != 3:
+                raise JWTError("Not enough segments")
+            header_b64, payload_b64, signature_b64 = segments
+
+            # Tokens minted by this service carry the exact precomputed header,
+            # so only foreign headers need to be decoded and checked.
+            if header_b64 != _TOKEN_HEADER_B64:
+                header = _decode_segment(header_b64)
+                if not isinstance(header, dict) or header.get("alg") != settings.ALGORITHM:
+                    raise JWTError("The specified alg value is not allowed")
+
+            payload = AuthService._verify_with_secret(header_b64, payload_b64, signature_b64)
 
             if payload.get("type") != token_type:
                 raise AuthenticationError("Invalid token type")
 
             return payload
 
-        except JWTError as e:
+        except JOSEError as e:
             logger.warning("JWT verification failed", error=str(e))
             raise AuthenticationError("Invalid token")
 
+    @staticmethod
+    def _verify_with_secret(
+        header_b64: str,
+        payload_b64: str,
+        signature_b64: str,
+    ) -> Dict[str, Any]:
+        """
+        Check the signature of pre-split token segments and validate claims.
+
+        The caller must already have checked that the header's ``alg`` is
+        settings.ALGORITHM.
+        """
+        try:
+            signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
+            signature = base64url_decode(signature_b64.encode("ascii"))
+        except (UnicodeError, binascii.Error) as e:
+            raise JWTError(f"Invalid crypto padding: {e}")
+
+        if _SIGNING_MAC is not None:
+            verified = hmac.compare_digest(_sign(signing_input), signature)
+        else:
+            verified = _verification_key().verify(signing_input, signature)
+        if not verified:
+            raise JWTError("Signature verification failed.")
+
+        payload = _decode_segment(payload_b64)
+        if not isinstance(payload, dict):
+            raise JWTError("Invalid payload string: must be a json object")
+
+        # Registered claims are checked as jwt.decode does with its default
+        # options and no expected audience.
+        now = int(time.time())
+
+        if "iat" in payload:
+            try:
+                int(payload["iat"])
+            except (TypeError, ValueError):
+                raise JWTClaimsError("Issued At claim (iat) must be an integer.")
+
+        if "nbf" in payload:
+            try:
+                nbf = int(payload["nbf"])
+            except (TypeError, ValueError):
+                raise JWTClaimsError("Not Before claim (nbf) must be an integer.")
+            if nbf > now:
+                raise JWTClaimsError("The token is not yet valid (nbf)")
+
+        if "exp" in payload:
+            try:
+                exp = int(payload["exp"])
+            except (TypeError, ValueError):
+                raise JWTClaimsError("Expiration Time claim (exp) must be an integer.")
+            if exp < now:
+                raise ExpiredSignatureError("Signature has expired.")
+
+        if "aud" in payload:
+            # No audience is expected, so any aud claim is rejected.
+            raise JWTClaimsError("Invalid audience")
+
+        return payload
+
     @staticmethod
     async def authenticate_user_db(
         db: AsyncSession,
@@ -115,12 +397,8 @@ class AuthService:
         """Authenticate user using PostgreSQL security functions."""
         try:
             # Call the PostgreSQL authenticate_user function
-            query = text(
-                "SELECT authenticate_user(:email, :password, :ip_address, :user_agent)"
-            )
-
             result = await db.execute(
-                query,
+                _AUTHENTICATE_STMT,
                 {
                     "email": email,
                     "password": password,
@@ -131,8 +409,7 @@ class AuthService:
 
             auth_result = result.scalar()
 
-            if isinstance(auth_result, str):
-                auth_result = json.loads(auth_result)
+            auth_result = _load_db_json(auth_result)
 
             if not auth_result.get("success"):
                 error_code = auth_result.get("error", "AUTHENTICATION_FAILED")
@@ -146,21 +423,13 @@ class AuthService:
                 )
 
                 # Map database errors to HTTP status codes
-                if error_code == "ACCOUNT_LOCKED":
-                    raise HTTPException(
-                        status_code=status.HTTP_423_LOCKED,
-                        detail=error_message
-                    )
-                elif error_code == "INVALID_CREDENTIALS":
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail=error_message
-                    )
-                else:
+                status_code = _AUTH_ERROR_STATUS.get(error_code)
+                if status_code is None:
                     raise HTTPException(
                         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         detail="Authentication system error"
                     )
+                raise HTTPException(status_code=status_code, detail=error_message)
 
             logger.info(
                 "User authenticated successfully",
@@ -170,7 +439,9 @@ class AuthService:
 
             return auth_result
 
-        except Exception as e:
+        except HTTPException:
+            raise
+        except DBAPIError as e:
             logger.error(
                 "Database authentication error",
                 error=str(e),
@@ -180,6 +451,17 @@ class AuthService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Authentication system error"
             )
+        except Exception as e:
+            logger.error(
+                "Unexpected authentication error",
+                error=str(e),
+                email=email,
+                exc_info=True
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Authentication system error"
+            )
 
     @staticmethod
     async def validate_session_db(
@@ -187,22 +469,21 @@ class AuthService:
     ) -> Dict[str, Any]:
         """Validate session using PostgreSQL function."""
         try:
-            query = text("SELECT validate_session(:session_token)")
-
             result = await db.execute(
-                query, {"session_token": session_token}
+                _VALIDATE_SESSION_STMT, {"session_token": session_token}
             )
 
             session_result = result.scalar()
 
-            if isinstance(session_result, str):
-                session_result = json.loads(session_result)
+            session_result = _load_db_json(session_result)
 
             if not session_result.get("valid"):
                 raise AuthenticationError("Invalid or expired session")
 
             return session_result
 
+        except AuthenticationError:
+            raise
         except Exception as e:
             logger.error("Session validation error", error=str(e))
             raise AuthenticationError("Session validation failed")
@@ -210,42 +491,24 @@ class AuthService:
     @staticmethod
     async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
         """Get user by ID."""
-        query = text(
-            "SELECT * FROM users WHERE id = :user_id AND status = 'active' AND deleted_at IS NULL"
-        )
-
-        result = await db.execute(query, {"user_id": user_id})
+        result = await db.execute(_USER_BY_ID_STMT, {"user_id": user_id})
         user_data = result.fetchone()
 
         if not user_data:
             return None
 
-        # Convert row to User object (simplified)
-        user = User()
-        for column, value in user_data._mapping.items():
-            setattr(user, column, value)
-
-        return user
+        return user_from_mapping(user_data._mapping)
 
     @staticmethod
     async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
         """Get user by email."""
-        query = text(
-            "SELECT * FROM users WHERE email = :email AND status = 'active' AND deleted_at IS NULL"
-        )
-
-        result = await db.execute(query, {"email": email})
+        result = await db.execute(_USER_BY_EMAIL_STMT, {"email": email})
         user_data = result.fetchone()
 
         if not user_data:
             return None
 
-        # Convert row to User object (simplified)
-        user = User()
-        for column, value in user_data._mapping.items():
-            setattr(user, column, value)
-
-        return user
+        return user_from_mapping(user_data._mapping)
 
     @staticmethod
     async def check_rate_limit(
@@ -258,12 +521,8 @@ class AuthService:
     ) -> Dict[str, Any]:
         """Check API rate limit using PostgreSQL function."""
         try:
-            query = text(
-                "SELECT check_rate_limit(:endpoint, :ip_address, :user_id, :limit, :window_minutes)"
-            )
-
             result = await db.execute(
-                query,
+                _RATE_LIMIT_STMT,
                 {
                     "endpoint": endpoint,
                     "ip_address": ip_address,
@@ -275,8 +534,7 @@ class AuthService:
 
             rate_limit_result = result.scalar()
 
-            if isinstance(rate_limit_result, str):
-                rate_limit_result = json.loads(rate_limit_result)
+            rate_limit_result = _load_db_json(rate_limit_result)
 
             return rate_limit_result
 
@@ -295,28 +553,23 @@ class AuthService:
         role: UserRole = UserRole.CUSTOMER,
         phone: Optional[str] = None,
         marketing_consent: bool = False,
-        email_verified: bool = False
+        email_verified: bool = False,
+        password_hash: Optional[str] = None
     ) -> str:
-        """Create a new user in the database and return user ID."""
+        """
+        Create a new user in the database and return user ID.
+
+        The INSERT is not committed here; callers commit once together with
+        any follow-up writes (e.g. the verification email) so a registration
+        costs a single commit round-trip and stays atomic. Callers that already
+        hashed the password may pass ``password_hash`` to skip hashing here.
+        """
         try:
-            password_hash = AuthService.get_password_hash(password)
-
-            query = text("""
-                INSERT INTO users (
-                    email, password_hash, first_name, last_name, phone, role,
-                    email_verified, marketing_consent, gdpr_consent_date,
-                    gdpr_consent_version, country, preferred_language, timezone, status
-                )
-                VALUES (
-                    :email, :password_hash, :first_name, :last_name, :phone, :role,
-                    :email_verified, :marketing_consent, NOW(), '1.0',
-                    'DK', 'da', 'Europe/Copenhagen', 'active'
-                )
-                RETURNING id
-            """)
+            if password_hash is None:
+                password_hash = await AuthService.hash_password(password)
 
             result = await db.execute(
-                query,
+                _CREATE_USER_STMT,
                 {
                     "email": email,
                     "password_hash": password_hash,
@@ -330,7 +583,6 @@ class AuthService:
             )
 
             user_id = result.scalar()
-            await db.commit()
 
             logger.info("User created successfully", user_id=user_id, email=email, role=role.value)
 
@@ -345,11 +597,8 @@ class AuthService:
     async def is_email_available(db: AsyncSession, email: str) -> bool:
         """Check if email is available for registration."""
         try:
-            query = text(
-                "SELECT 1 FROM users WHERE email = :email AND deleted_at IS NULL LIMIT 1"
-            )
-            result = await db.execute(query, {"email": email})
-            return result.fetchone() is None
+            result = await db.execute(_EMAIL_EXISTS_STMT, {"email": email})
+            return not result.scalar()
         except Exception as e:
             logger.error("Email availability check error", error=str(e), email=email)
             return False
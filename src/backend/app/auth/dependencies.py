@@ -1,15 +1,20 @@
 """
 Authentication dependencies for FastAPI.
 """
-from typing import Optional
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
 import structlog
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.auth import AuthService, auth_service
-from app.core.database import get_db
+from app.auth.auth import AuthService, auth_service, user_from_mapping
+from app.core.config import settings
+from app.core.database import current_user_id, get_db, get_db_ro
+from app.middleware.enhanced_security import apply_rate_limiting
 from app.models.enums import UserRole
 from app.models.user import User
 
@@ -18,76 +23,158 @@ logger = structlog.get_logger(__name__)
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
+# Recently verified bearer tokens -> (expires_at, JWT payload, user columns).
+# A client sends the same token on every request, so a short-lived entry
+# skips signature verification and the user SELECT for bursts of traffic.
+# Keys are truncated SHA-256 digests; raw tokens are never held here.
+_TOKEN_CACHE_TTL_SECONDS = 30
+_TOKEN_CACHE_SIZE = 10000
+_token_cache: "OrderedDict[str, Tuple[float, Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
 
-async def get_current_user(
-    request: Request,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
+
+def _token_cache_key(token: str) -> str:
+    """Cache key for a bearer token."""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def _get_cached_token(token: str) -> Optional[Tuple[Dict[str, Any], User]]:
+    """Return the cached payload and a fresh User for a token, if still valid."""
+    key = _token_cache_key(token)
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+
+    expires_at, payload, user_values = entry
+    if expires_at <= time.time():
+        _token_cache.pop(key, None)
+        return None
+
+    _token_cache.move_to_end(key)
+    # Hand out a new instance per request so callers never share state
+    return payload, user_from_mapping(user_values)
+
+
+def _cache_token(token: str, payload: Dict[str, Any], user: User) -> None:
+    """Remember a verified token; never beyond the token's own expiry."""
+    expires_at = time.time() + _TOKEN_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        expires_at = min(expires_at, payload["exp"])
+
+    user_values = {
+        key: value for key, value in user.__dict__.items() if key != "_sa_instance_state"
+    }
+    _token_cache[_token_cache_key(token)] = (expires_at, payload, user_values)
+    if len(_token_cache) > _TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+
+def invalidate_user_tokens(user_id: Any) -> None:
     """
-    Get the current authenticated user.
+    Drop every cached token belonging to a user (logout, password change,
+    role or status change).
 
-    Args:
-        request: FastAPI request object
-        credentials: Bearer token credentials
-        db: Database session
+    ``user_id`` may be a str or a UUID (raw asyncpg rows return
+    ``pgproto.UUID``), so both sides are compared as strings. The cache is
+    per process: other workers drop the user's entries at the TTL.
+    """
+    user_id = str(user_id)
+    stale = [
+        key for key, (_, payload, _) in _token_cache.items()
+        if str(payload.get("sub")) == user_id
+    ]
+    for key in stale:
+        del _token_cache[key]
 
-    Returns:
-        User: Current user
 
-    Raises:
-        HTTPException: If authentication fails
+async def _resolve_user(token: str, db: AsyncSession) -> Tuple[Optional[User], str]:
     """
-    if not credentials:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authorization header required",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    Resolve a bearer token to an active user.
+
+    Returns ``(user, "")`` on success or ``(None, reason)`` on failure.
+    Failures are returned rather than raised so get_optional_user can treat
+    them as anonymous without building an HTTPException per request.
+    """
+    cached = _get_cached_token(token)
+    if cached is not None:
+        payload, user = cached
+        current_user_id.set(payload["sub"])
+        return user, ""
 
     try:
         # Verify JWT token
-        payload = auth_service.verify_token(credentials.credentials)
+        payload = auth_service.verify_token(token)
         user_id = payload.get("sub")
 
         if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token: missing user ID",
-            )
+            return None, "Invalid token: missing user ID"
+
+        # Set user context for RLS; applied when the session begins its
+        # transaction instead of costing a dedicated round-trip here
+        current_user_id.set(user_id)
 
         # Get user from database
         user = await auth_service.get_user_by_id(db, user_id)
 
         if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-            )
+            failure = "User not found"
+        elif not user.is_active:
+            failure = "User account is inactive"
+        else:
+            _cache_token(token, payload, user)
+            return user, ""
 
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User account is inactive",
-            )
+    except HTTPException as e:
+        return None, e.detail
+    except Exception as e:
+        logger.error("Authentication error", error=str(e))
+        failure = "Could not validate credentials"
 
-        # Set user context for RLS
-        await db.execute(
-            "SELECT set_config('app.current_user_id', :user_id, true)",
-            {"user_id": user_id}
-        )
+    current_user_id.set(None)
+    return None, failure
 
-        return user
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error("Authentication error", error=str(e))
+async def _authenticated_user(
+    credentials: Optional[HTTPAuthorizationCredentials], db: AsyncSession
+) -> User:
+    """Resolve the bearer token or raise 401."""
+    if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="Authorization header required",
+            headers={"WWW-Authenticate": "Bearer"},
         )
 
+    user, failure = await _resolve_user(credentials.credentials, db)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=failure,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """
+    Get the current authenticated user.
+
+    Args:
+        request: FastAPI request object
+        credentials: Bearer token credentials
+        db: Database session
+
+    Returns:
+        User: Current user
+
+    Raises:
+        HTTPException: If authentication fails
+    """
+    return await _authenticated_user(credentials, db)
+
 
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
@@ -137,11 +224,14 @@ async def get_current_admin(
     return current_user
 
 
+_STAFF_OR_ADMIN = frozenset({UserRole.STAFF, UserRole.ADMIN})
+
+
 async def get_current_staff_or_admin(
     current_user: User = Depends(get_current_active_user),
 ) -> User:
     """Get current staff or admin user."""
-    if current_user.role not in [UserRole.STAFF, UserRole.ADMIN]:
+    if current_user.role not in _STAFF_OR_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Staff or admin access required"
@@ -161,23 +251,43 @@ async def get_optional_user(
     if not credentials:
         return None
 
-    try:
-        return await get_current_user(request, credentials, db)
-    except HTTPException:
-        return None
+    user, _ = await _resolve_user(credentials.credentials, db)
+    return user
+
+
+async def get_optional_user_ro(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_db_ro),
+) -> Optional[User]:
+    """
+    get_optional_user for read-only routes.
+
+    Resolves the user on the route's read-only session instead of checking
+    out a second pooled connection through get_db.
+    """
+    return await get_optional_user(request, credentials, db)
 
 
 class RoleChecker:
     """Role-based access control checker."""
 
     def __init__(self, allowed_roles: list[UserRole]):
-        self.allowed_roles = allowed_roles
+        self.allowed_roles = frozenset(allowed_roles)
+        # Built once; the denial message is the same for every request
+        self._denied_detail = (
+            f"Access denied. Required roles: {[role.value for role in allowed_roles]}"
+        )
 
-    def __call__(self, current_user: User = Depends(get_current_active_user)) -> User:
+    async def __call__(self, current_user: User = Depends(get_current_active_user)) -> User:
+        return self.check(current_user)
+
+    def check(self, current_user: User) -> User:
+        """Return the user if their role is allowed, otherwise raise 403."""
         if current_user.role not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Access denied. Required roles: {[role.value for role in self.allowed_roles]}"
+                detail=self._denied_detail
             )
         return current_user
 
@@ -191,64 +301,31 @@ require_customer = RoleChecker([UserRole.CUSTOMER])
 
 async def rate_limit_check(
     request: Request,
-    db: AsyncSession = Depends(get_db),
     current_user: Optional[User] = Depends(get_optional_user),
 ) -> None:
     """
-    Check API rate limits using PostgreSQL function.
+    Check API rate limits with the shared application rate limiter.
+
+    Limits are kept per user when authenticated and per client IP otherwise,
+    in memory or in Redis depending on RATE_LIMIT_BACKEND.
 
     Args:
         request: FastAPI request object
-        db: Database session
         current_user: Current user (if authenticated)
 
     Raises:
         HTTPException: If rate limit exceeded
     """
-    # Get client IP
-    client_ip = request.client.host
-    if "x-forwarded-for" in request.headers:
-        client_ip = request.headers["x-forwarded-for"].split(",")[0].strip()
-    elif "x-real-ip" in request.headers:
-        client_ip = request.headers["x-real-ip"]
-
-    # Get endpoint
-    endpoint = f"{request.method} {request.url.path}"
-
-    # Check rate limit - TEMPORARILY DISABLED FOR TESTING
-    # result = await auth_service.check_rate_limit(
-    #     db=db,
-    #     endpoint=endpoint,
-    #     ip_address=client_ip,
-    #     user_id=current_user.id if current_user else None,
-    #     limit=100,  # Default limit
-    #     window_minutes=60
-    # )
-
-    # Temporarily return allowed for testing
-    result = {"allowed": True, "limit": 100, "remaining": 99}
-
-    if not result.get("allowed", True):
-        reason = result.get("reason", "RATE_LIMITED")
-
-        # Add rate limit headers
-        headers = {
-            "X-RateLimit-Limit": str(result.get("limit", 100)),
-            "X-RateLimit-Remaining": str(result.get("remaining", 0)),
-        }
-
-        if "reset_at" in result:
-            headers["X-RateLimit-Reset"] = result["reset_at"]
-
-        if reason == "LIMIT_EXCEEDED":
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded",
-                headers=headers
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many requests",
-                headers=headers
-            )
\ No newline at end of file
+    await apply_rate_limiting(
+        request,
+        user_id=str(current_user.id) if current_user else None,
+        limit=settings.RATE_LIMIT_PER_MINUTE,
+    )
+
+
+async def rate_limit_check_ro(
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user_ro),
+) -> None:
+    """rate_limit_check for routes that read through get_db_ro."""
+    await rate_limit_check(request, current_user)
@@ -1,8 +1,8 @@
 """
 Configuration settings for the Loctician Booking System API.
 """
-from functools import lru_cache
-from typing import List, Optional
+from functools import cached_property, lru_cache
+from typing import List, Optional, Tuple
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,6 +15,9 @@ class Settings(BaseSettings):
         env_file=".env",
         case_sensitive=True,
         extra="allow",
+        # Settings are read-only after startup, which also lets modules bind
+        # hot values to constants at import without them going stale.
+        frozen=True,
     )
 
     # API Configuration
@@ -42,6 +45,11 @@ class Settings(BaseSettings):
     SESSION_HTTPONLY_COOKIES: bool = True
     SESSION_SAMESITE: str = "lax"
     CSRF_PROTECTION_ENABLED: bool = True
+    BCRYPT_TARGET_MS: int = 100
+    # Calibration only ever raises the cost above this floor, which matches
+    # the SQL side (gen_salt('bf', 12))
+    BCRYPT_MIN_ROUNDS: int = 12
+    BCRYPT_MAX_ROUNDS: int = 14
 
     # CORS
     BACKEND_CORS_ORIGINS: str = "http://localhost:3001"
@@ -50,15 +58,12 @@ class Settings(BaseSettings):
         description="Base URL for the frontend application",
     )
 
-    @property
-    def cors_origins_list(self) -> List[str]:
-        """Convert CORS origins string to list."""
+    @cached_property
+    def cors_origins_list(self) -> Tuple[str, ...]:
+        """Convert CORS origins string to a tuple, parsed once per instance."""
         if isinstance(self.BACKEND_CORS_ORIGINS, str):
-            if "," in self.BACKEND_CORS_ORIGINS:
-                return [origin.strip() for origin in self.BACKEND_CORS_ORIGINS.split(",")]
-            else:
-                return [self.BACKEND_CORS_ORIGINS.strip()]
-        return self.BACKEND_CORS_ORIGINS
+            return tuple(origin.strip() for origin in self.BACKEND_CORS_ORIGINS.split(","))
+        return tuple(self.BACKEND_CORS_ORIGINS)
 
     # Email Configuration
     SMTP_HOST: str = "smtp.gmail.com"
@@ -2,18 +2,21 @@
 import asyncio
 import ssl
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncGenerator, Optional
 from urllib.parse import urlparse
 
+import orjson
 import structlog
-from sqlalchemy import event
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.core.config import settings
 
@@ -26,6 +29,15 @@ class Base(DeclarativeBase):
     pass
 
 
+@lru_cache(maxsize=1)
+def _get_ssl_context() -> ssl.SSLContext:
+    """Build the verifying TLS context once; loading the CA bundle is slow."""
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = True
+    ssl_context.verify_mode = ssl.CERT_REQUIRED
+    return ssl_context
+
+
 # Configure TLS when talking to remote hosts such as Neon and provide
 # sensible defaults for other database backends (e.g. SQLite used in tests).
 _db_url = urlparse(settings.DATABASE_URL)
@@ -36,30 +48,73 @@ engine_kwargs = {
     # Respect explicit SQL echo configuration instead of coupling it to DEBUG.
     "echo": settings.SQL_ECHO,
     "future": True,  # Use SQLAlchemy 2.0 style
+    # The asyncpg dialect decodes json/jsonb values in its type codec, so
+    # function results arrive as dicts; use orjson for that decode.
+    "json_deserializer": orjson.loads,
 }
 
 if _is_postgres:
+    # Transaction-mode poolers (e.g. Neon's "-pooler" endpoints) hand each
+    # transaction a different server connection, so prepared statements
+    # cannot be cached client-side there.
+    _behind_pooler = bool(_db_url.hostname and "-pooler" in _db_url.hostname)
+    _statement_cache_size = 0 if _behind_pooler else 1024
+
+    # Session settings travel in the startup packet. Only parameters an
+    # ordinary role may set belong here: a superuser-only or unknown setting
+    # (e.g. log_statement, an lc_time locale the server lacks) makes every
+    # connection attempt fail. Server logging and locale are left to the
+    # server or the role's configuration.
+    server_settings = {
+        "application_name": f"jli_loctician_{settings.ENVIRONMENT}",
+        "timezone": settings.DEFAULT_TIMEZONE,
+        "DateStyle": "ISO, DMY",  # Danish date format
+        # Performance optimizations
+        "jit": "off",  # Disable JIT for consistency
+        "work_mem": "64MB",  # Optimized for typical workload
+        "maintenance_work_mem": "256MB",
+        "effective_cache_size": "1GB",
+        "random_page_cost": "1.1",  # SSD optimization
+        "seq_page_cost": "1.0",
+        # Connection and timeout settings
+        "statement_timeout": "60s",
+        "lock_timeout": "30s",
+        "idle_in_transaction_session_timeout": "300s",
+    }
+    if _behind_pooler:
+        # PgBouncer-style poolers reject startup parameters they do not
+        # track; keep to the ones they pass through.
+        server_settings = {
+            name: server_settings[name]
+            for name in ("application_name", "timezone", "DateStyle")
+        }
+
     connect_args = {
-        "server_settings": {
-            "jit": "off",
-            "log_statement": "none",
-            "application_name": f"jli_loctician_{settings.ENVIRONMENT}",
-        },
+        "server_settings": server_settings,
         "command_timeout": 60,
+        # Keep more prepared statements per connection so repeated queries
+        # skip the PREPARE round-trip. SQLAlchemy's adapter prepares every
+        # statement itself (prepared_statement_cache_size); the asyncpg
+        # settings cover statements asyncpg prepares internally.
+        "prepared_statement_cache_size": _statement_cache_size,
+        "statement_cache_size": _statement_cache_size,
+        "max_cached_statement_lifetime": 900,
+        "max_cacheable_statement_size": 32 * 1024,
     }
 
     if _db_url.hostname and _db_url.hostname not in {"localhost", "127.0.0.1"}:
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = True
-        ssl_context.verify_mode = ssl.CERT_REQUIRED
-        connect_args["ssl"] = ssl_context
+        connect_args["ssl"] = _get_ssl_context()
+        if _db_url.hostname.endswith(".neon.tech"):
+            # Neon accepts TLS straight away; skip the SSLRequest round-trip.
+            connect_args["direct_tls"] = True
 
     engine_kwargs.update(
         {
-            "pool_size": 10,  # Reduced from 20 for better resource management
-            "max_overflow": 20,  # Allow overflow connections
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
             "pool_pre_ping": True,  # Test connections before use
-            "pool_recycle": 3600,  # Recycle connections every hour
+            "pool_recycle": settings.DB_POOL_RECYCLE,
             "pool_timeout": 30,  # Timeout for getting connection from pool
             "connect_args": connect_args,
         }
@@ -87,33 +142,32 @@ AsyncSessionLocal = async_sessionmaker(
     autocommit=False,
 )
 
+# Read-only sessions run in autocommit, so plain SELECTs skip the BEGIN and
+# COMMIT round-trips. The engine copy shares the main engine's pool.
+_read_only_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
+ReadOnlySessionLocal = async_sessionmaker(
+    _read_only_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False,
+)
+
 
-@event.listens_for(engine.sync_engine, "connect")
-def set_postgresql_params(dbapi_connection, connection_record):
-    """Set PostgreSQL-specific connection parameters for optimal performance."""
-    if "postgresql" in str(dbapi_connection):
-        with dbapi_connection.cursor() as cursor:
-            # Performance optimizations
-            cursor.execute("SET jit = off")  # Disable JIT for consistency
-            cursor.execute("SET work_mem = '64MB'")  # Optimized for typical workload
-            cursor.execute("SET maintenance_work_mem = '256MB'")
-            cursor.execute("SET effective_cache_size = '1GB'")
-            cursor.execute("SET random_page_cost = 1.1")  # SSD optimization
-            cursor.execute("SET seq_page_cost = 1.0")
+# User id for PostgreSQL row level security. The auth dependency sets it per
+# request; it is applied when the request's session opens a transaction.
+current_user_id: ContextVar[Optional[str]] = ContextVar("current_user_id", default=None)
 
-            # Connection and timeout settings
-            cursor.execute("SET statement_timeout = '60s'")
-            cursor.execute("SET lock_timeout = '30s'")
-            cursor.execute("SET idle_in_transaction_session_timeout = '300s'")
+_SET_RLS_USER_STMT = text("SELECT set_config('app.current_user_id', :user_id, true)")
 
-            # Application settings
-            cursor.execute(f"SET timezone = '{settings.DEFAULT_TIMEZONE}'")
-            cursor.execute("SET DateStyle = 'ISO, DMY'")  # Danish date format
-            cursor.execute("SET lc_time = 'da_DK.UTF-8'")  # Danish locale for time
 
-            # Security and audit
-            cursor.execute("SET log_statement = 'none'")  # Reduce log noise
-            cursor.execute("SET log_min_duration_statement = 1000")  # Log slow queries
+@event.listens_for(Session, "after_begin")
+def set_rls_user(session, transaction, connection):
+    """Scope the current request's user to the transaction just begun."""
+    user_id = current_user_id.get()
+    if user_id is not None and IS_POSTGRES:
+        connection.execute(_SET_RLS_USER_STMT, {"user_id": user_id})
 
 
 @asynccontextmanager
@@ -147,6 +201,41 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_db_ro() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for FastAPI handlers that only read public data.
+
+    Nothing is committed. Statements run outside a transaction, so the
+    transaction-scoped row level security user is not applied; use get_db
+    for anything that depends on the current user.
+
+    Yields:
+        AsyncSession: Database session
+    """
+    async with ReadOnlySessionLocal() as session:
+        yield session
+
+
+async def _warm_pool() -> None:
+    """
+    Open the pool's steady-state connections up front.
+
+    All connections are checked out at once so the pool really grows to
+    DB_POOL_SIZE; the first requests then skip connect, TLS and auth.
+    """
+    if not IS_POSTGRES:
+        return
+
+    connections = [engine.connect() for _ in range(settings.DB_POOL_SIZE)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in connections))
+    finally:
+        await asyncio.gather(
+            *(conn.close() for conn in connections if conn.sync_connection is not None)
+        )
+    logger.info("Database pool warmed", connections=settings.DB_POOL_SIZE)
+
+
 async def init_db() -> None:
     """Initialize database with tables."""
     try:
@@ -169,6 +258,8 @@ async def init_db() -> None:
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
             logger.info("Database tables created successfully")
+
+        await _warm_pool()
     except Exception as exc:  # pragma: no cover - connection failures handled at runtime
         error_message = str(exc)
         logger.error("Database initialization failed", error=error_message)
@@ -194,6 +285,9 @@ async def close_db() -> None:
     logger.info("Database connections closed")
 
 
+_HEALTHCHECK_STMT = text("SELECT 1")
+
+
 class DatabaseHealthCheck:
     """Database health check utility."""
 
@@ -206,10 +300,10 @@ class DatabaseHealthCheck:
             bool: True if database is healthy
         """
         try:
-            from sqlalchemy import text
-            async with get_db_session() as session:
-                result = await session.execute(text("SELECT 1"))
-                return result.scalar() == 1
+            # A bare connection is enough for a probe: no ORM session,
+            # identity map or commit round-trip.
+            async with engine.connect() as conn:
+                return await conn.scalar(_HEALTHCHECK_STMT) == 1
         except Exception as e:
             logger.error("Database health check failed", error=str(e))
             return False
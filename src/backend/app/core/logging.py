@@ -1,37 +1,137 @@
 """
 Structured logging configuration.
 """
+import atexit
 import logging
+import queue
 import sys
-from typing import Any, Dict, Optional
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Union
 
+import orjson
 import structlog
 from uvicorn.logging import DefaultFormatter
 
 from app.core.config import settings
 
 
+class QueueLogger:
+    """structlog logger that hands rendered lines to the log writer thread."""
+
+    __slots__ = ("_sink",)
+
+    def __init__(self, log_queue: queue.SimpleQueue):
+        self._sink = log_queue.put
+
+    def write_directly(self, stream) -> None:
+        """Write to ``stream`` from now on; used once the writer has stopped."""
+
+        def write(message: Union[str, bytes]) -> None:
+            if isinstance(message, bytes):
+                message = message.decode("utf-8", "replace")
+            stream.write(message + "\n")
+            stream.flush()
+
+        self._sink = write
+
+    def msg(self, message: Union[str, bytes]) -> None:
+        self._sink(message)
+
+    log = debug = info = warn = warning = msg
+    err = error = critical = exception = fatal = failure = msg
+
+
+class QueueLoggerFactory:
+    """Hand every structlog logger the same QueueLogger."""
+
+    def __init__(self, logger: QueueLogger):
+        self._logger = logger
+
+    def __call__(self, *args: Any) -> QueueLogger:
+        return self._logger
+
+
+class LogWriter(QueueListener):
+    """
+    Background thread writing queued log output to stdout.
+
+    The queue carries both structlog's pre-rendered lines and stdlib
+    LogRecords from third-party libraries; stdout is flushed whenever the
+    queue runs dry rather than after every line.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, stream):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        super().__init__(log_queue, handler, respect_handler_level=True)
+        self.stream = stream
+
+    def handle(self, record) -> None:
+        if isinstance(record, logging.LogRecord):
+            super().handle(record)
+        else:
+            if isinstance(record, bytes):
+                record = record.decode("utf-8", "replace")
+            self.stream.write(record + "\n")
+        if self.queue.empty():
+            self.stream.flush()
+
+
+_log_writer: Optional[LogWriter] = None
+# The QueueLogger handed to structlog; cached bound loggers keep it, so it is
+# retargeted rather than replaced when the writer stops
+_queue_logger: Optional[QueueLogger] = None
+
+_stack_info_renderer = structlog.processors.StackInfoRenderer()
+
+
+def _render_exc_and_stack(logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Render exc_info/stack_info, skipping both processors when neither is set."""
+    if "exc_info" not in event_dict and "stack_info" not in event_dict:
+        return event_dict
+    event_dict = _stack_info_renderer(logger, method_name, event_dict)
+    return structlog.processors.format_exc_info(logger, method_name, event_dict)
+
+
+def stop_logging() -> None:
+    """
+    Write out everything still queued and stop the log writer thread.
+
+    Later log calls (uvicorn shutdown messages, another app lifespan in
+    tests) go straight to stdout instead of into a queue nobody drains.
+    """
+    global _log_writer
+    if _log_writer is None:
+        return
+    _log_writer.stop()
+    _log_writer = None
+
+    _queue_logger.write_directly(sys.stdout)
+    root = logging.getLogger()
+    logging.basicConfig(
+        format="%(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+        level=root.level,
+        force=True,
+    )
+
+
 def configure_logging() -> None:
     """Configure structured logging for the application."""
-
-    # Configure structlog
-    timestamper = structlog.processors.TimeStamper(fmt="ISO")
+    level = getattr(logging, settings.LOG_LEVEL.upper())
 
     shared_processors = [
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        timestamper,
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        _render_exc_and_stack,
     ]
 
     if settings.LOG_FORMAT == "json":
-        # JSON output for production
+        # JSON output for production; orjson renders straight to bytes
         processors = shared_processors + [
-            structlog.processors.JSONRenderer()
+            structlog.processors.JSONRenderer(serializer=orjson.dumps)
         ]
     else:
         # Human-readable output for development
@@ -39,18 +139,31 @@ def configure_logging() -> None:
             structlog.dev.ConsoleRenderer(colors=True)
         ]
 
+    # Log calls only enqueue their output; a single writer thread does the
+    # stdout I/O so request handlers never block on it.
+    global _log_writer, _queue_logger
+    stop_logging()
+    log_queue = queue.SimpleQueue()
+    _log_writer = LogWriter(log_queue, sys.stdout)
+    _log_writer.start()
+    _queue_logger = QueueLogger(log_queue)
+
+    # Application logs bypass the stdlib logging module: calls below LOG_LEVEL
+    # are no-ops and enabled ones skip logging's locks and handlers.
     structlog.configure(
         processors=processors,
-        wrapper_class=structlog.stdlib.BoundLogger,
-        logger_factory=structlog.stdlib.LoggerFactory(),
+        context_class=dict,
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        logger_factory=QueueLoggerFactory(_queue_logger),
         cache_logger_on_first_use=True,
     )
 
-    # Configure standard library logging
+    # Standard library logging still serves third-party libraries
     logging.basicConfig(
         format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, settings.LOG_LEVEL.upper()),
+        handlers=[QueueHandler(log_queue)],
+        level=level,
+        force=True,
     )
 
     # Set log levels for specific modules
@@ -61,7 +174,7 @@ def configure_logging() -> None:
 
 
 class RequestLoggerMiddleware:
-    """Middleware to log HTTP requests and responses."""
+    """Pure ASGI middleware to log HTTP requests and responses."""
 
     def __init__(self, app):
         self.app = app
@@ -71,30 +184,39 @@ class RequestLoggerMiddleware:
         if scope["type"] != "http":
             return await self.app(scope, receive, send)
 
-        request_id = None
-        start_time = None
+        start = time.perf_counter()
+        status_code = 0
+        response_headers = ()
 
         async def send_wrapper(message):
-            nonlocal start_time
-            if message["type"] == "http.response.start":
-                start_time = structlog.get_logger().info
-                # Extract request ID from headers if available
-                headers = dict(message.get("headers", []))
-                request_id = headers.get(b"x-request-id", b"").decode()
-
-            elif message["type"] == "http.response.body" and start_time:
-                # Log response
+            nonlocal status_code, response_headers
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                status_code = message["status"]
+                response_headers = message.get("headers", ())
+
+            elif message_type == "http.response.body" and not message.get("more_body", False):
+                request_id = None
+                for name, value in response_headers:
+                    if name == b"x-request-id":
+                        request_id = value.decode("latin-1")
+                        break
+
                 self.logger.info(
                     "HTTP request completed",
                     method=scope["method"],
                     path=scope["path"],
-                    status_code=message.get("status", 0),
+                    status_code=status_code,
                     request_id=request_id,
+                    duration_ms=round((time.perf_counter() - start) * 1000, 2),
                 )
 
-            return await send(message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
 
-        return await self.app(scope, receive, send_wrapper)
+atexit.register(stop_logging)
 
 
 def get_logger(name: str) -> structlog.BoundLogger:
@@ -1,155 +1,241 @@
 """
 Security middleware for the Loctician Booking System.
 """
+import logging
+import math
+import re
+import secrets
 import time
-from typing import Optional
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
 
 import structlog
 from fastapi import Request, Response, status
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
+from app.middleware.enhanced_security import get_client_ip
+
 logger = structlog.get_logger(__name__)
 
+# Per-request lookups use module-level sets instead of list literals
+_LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1"})
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Headers added to every response, encoded once; HSTS only off localhost
+_SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (
+        b"permissions-policy",
+        b"camera=(), microphone=(), geolocation=(), "
+        b"payment=(), usb=(), magnetometer=(), accelerometer=(), gyroscope=()",
+    ),
+]
+_HSTS_SECURITY_HEADERS = _SECURITY_HEADERS + [
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains; preload"),
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _HSTS_SECURITY_HEADERS)
+
+_token_hex = secrets.token_hex
+
+# Paths the request screening middlewares pass straight through
+_UNSCREENED_PATHS = ("/static/", "/health", "/docs", "/redoc", "/openapi.json")
+
+# Basic SQL injection markers as one alternation, so a query string is
+# scanned in a single pass. Keywords match on word boundaries to avoid
+# false positives such as "communion selection".
+_SQL_INJECTION_PATTERN = re.compile(
+    r"\bunion\s+(?:all\s+)?select\b"
+    r"|\bdrop\s+table\b"
+    r"|\bdelete\s+from\b"
+    r"|\binsert\s+into\b"
+    r"|\bupdate\s+\w+\s+set\b"
+    r"|--|/\*|\*/"
+    r"|\b(?:xp|sp)_"
+    r"|\bexec(?:ute)?\s*\(",
+    re.IGNORECASE,
+)
+
+# Sliding window log of one client's requests, trimmed, appended to and
+# counted in one atomic call. KEYS: window key. ARGV: now_ms, window_ms,
+# member. Returns {count, oldest_ms}.
+_SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], window)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {redis.call('ZCARD', KEYS[1]), tonumber(oldest[2])}
+"""
+
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+def _get_client_ip(request: Request) -> str:
+    """Extract client IP address, preferring proxy headers."""
+    return get_client_ip(request.scope) or "unknown"
+
+
+class SecurityHeadersMiddleware:
     """Add security headers to all responses."""
 
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = (
-            "camera=(), microphone=(), geolocation=(), "
-            "payment=(), usb=(), magnetometer=(), accelerometer=(), gyroscope=()"
-        )
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
         # HSTS header for production
-        if not request.url.hostname in ["localhost", "127.0.0.1"]:
-            response.headers["Strict-Transport-Security"] = (
-                "max-age=31536000; includeSubDomains; preload"
-            )
+        if Request(scope).url.hostname in _LOCAL_HOSTS:
+            security_headers = _SECURITY_HEADERS
+        else:
+            security_headers = _HSTS_SECURITY_HEADERS
 
-        return response
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Our values replace any the handler set for the same names
+                message["headers"] = [
+                    header for header in message.get("headers", ())
+                    if header[0] not in _SECURITY_HEADER_NAMES
+                ] + security_headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """Log HTTP requests and responses with security context."""
 
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        request_id = f"{int(start_time * 1000000)}"
-
-        # Extract client information
-        client_ip = self._get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "Unknown")
-
-        # Log request start
-        logger.info(
-            "HTTP request started",
-            request_id=request_id,
-            method=request.method,
-            path=request.url.path,
-            query_params=str(request.query_params) if request.query_params else None,
-            client_ip=client_ip,
-            user_agent=user_agent,
-        )
-
-        # Process request
-        response = await call_next(request)
-
-        # Calculate processing time
-        process_time = time.time() - start_time
-
-        # Log response
-        logger.info(
-            "HTTP request completed",
-            request_id=request_id,
-            method=request.method,
-            path=request.url.path,
-            status_code=response.status_code,
-            process_time=f"{process_time:.4f}s",
-            response_size=response.headers.get("content-length", "unknown"),
-        )
+        start_ns = time.monotonic_ns()
+        request_id = _token_hex(8)
+
+        # Every log line emitted while handling the request carries its ID
+        with structlog.contextvars.bound_contextvars(request_id=request_id):
+            # Log request start; debug only, so production skips building it
+            if logger.is_enabled_for(logging.DEBUG):
+                logger.debug(
+                    "HTTP request started",
+                    method=request.method,
+                    path=request.url.path,
+                    query_params=str(request.query_params) if request.query_params else None,
+                    client_ip=_get_client_ip(request),
+                    user_agent=request.headers.get("user-agent", "Unknown"),
+                )
+
+            # Process request
+            response = await call_next(request)
+
+            # Calculate processing time
+            process_time_ns = time.monotonic_ns() - start_ns
+
+            # Log response
+            logger.info(
+                "HTTP request completed",
+                method=request.method,
+                path=request.url.path,
+                client_ip=_get_client_ip(request),
+                status_code=response.status_code,
+                process_time_ns=process_time_ns,
+                response_size=response.headers.get("content-length", "unknown"),
+            )
 
         # Add headers
         response.headers["X-Request-ID"] = request_id
-        response.headers["X-Process-Time"] = f"{process_time:.4f}"
+        response.headers["X-Process-Time"] = f"{process_time_ns / 1e9:.4f}"
 
         return response
 
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        # Check for forwarded headers (load balancer/proxy)
-        if "x-forwarded-for" in request.headers:
-            return request.headers["x-forwarded-for"].split(",")[0].strip()
-        elif "x-real-ip" in request.headers:
-            return request.headers["x-real-ip"]
-        elif request.client:
-            return request.client.host
-        else:
-            return "unknown"
-
-
-class DatabaseRLSMiddleware(BaseHTTPMiddleware):
-    """Set PostgreSQL Row Level Security context for authenticated users."""
-
-    async def dispatch(self, request: Request, call_next):
-        # This middleware sets the app.current_user_id setting for PostgreSQL RLS
-        # The actual user ID will be set in the authentication dependencies
 
-        response = await call_next(request)
-
-        return response
-
-
-class SuspiciousActivityMiddleware(BaseHTTPMiddleware):
-    """Monitor for suspicious activity patterns."""
-
-    def __init__(self, app, max_requests_per_minute: int = 120):
-        super().__init__(app)
+class DatabaseRLSMiddleware:
+    """
+    Set PostgreSQL Row Level Security context for authenticated users.
+
+    The auth dependencies record the user in ``current_user_id`` and the
+    session's ``after_begin`` hook (app.core.database) applies it with one
+    transaction-local ``set_config`` as each transaction opens, on the
+    connection the queries run on. Nothing is left to do per request, so
+    this is a plain ASGI pass-through kept for existing middleware stacks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+class SuspiciousActivityMiddleware:
+    """
+    Monitor for suspicious activity patterns.
+
+    Requests per client IP are counted over a sliding one minute window.
+    With ``redis_url`` the window lives in Redis and is shared by every
+    worker; otherwise each process keeps its own. Requests under
+    ``skip_paths`` are not screened.
+    """
+
+    WINDOW_SECONDS = 60
+    # Least recently seen IPs are dropped beyond this many
+    MAX_TRACKED_IPS = 100_000
+
+    def __init__(
+        self,
+        app,
+        max_requests_per_minute: int = 120,
+        redis_url: Optional[str] = None,
+        skip_paths: Tuple[str, ...] = _UNSCREENED_PATHS,
+    ):
+        self.app = app
+        # Tuple so a single str.startswith() call checks every prefix
+        self.skip_paths = tuple(skip_paths)
         self.max_requests_per_minute = max_requests_per_minute
-        self.request_history = {}  # In production, use Redis
-
-    async def dispatch(self, request: Request, call_next):
-        client_ip = self._get_client_ip(request)
-        current_time = time.time()
-
-        # Clean old entries (older than 1 minute)
-        cutoff_time = current_time - 60
-        if client_ip in self.request_history:
-            self.request_history[client_ip] = [
-                req_time for req_time in self.request_history[client_ip]
-                if req_time > cutoff_time
-            ]
-
-        # Add current request
-        if client_ip not in self.request_history:
-            self.request_history[client_ip] = []
-        self.request_history[client_ip].append(current_time)
+        self.redis = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self.redis = redis.from_url(redis_url, max_connections=32)
+            self._window_script = self.redis.register_script(_SLIDING_WINDOW_LUA)
+        # ip -> request times in the window; bounded since one more request
+        # than the limit is all that is needed to reject
+        self._windows: "OrderedDict[str, deque]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_paths):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        client_ip = _get_client_ip(request)
+        requests_count, reset_seconds = await self._record_request(client_ip)
+
+        rate_limit_headers = {
+            "X-RateLimit-Limit": str(self.max_requests_per_minute),
+            "X-RateLimit-Remaining": str(max(0, self.max_requests_per_minute - requests_count)),
+            "X-RateLimit-Reset": str(reset_seconds),
+        }
 
         # Check if rate limit exceeded
-        if len(self.request_history[client_ip]) > self.max_requests_per_minute:
+        if requests_count > self.max_requests_per_minute:
             logger.warning(
                 "Suspicious activity detected - rate limit exceeded",
                 client_ip=client_ip,
-                requests_count=len(self.request_history[client_ip]),
+                requests_count=requests_count,
                 path=request.url.path,
                 user_agent=request.headers.get("user-agent"),
             )
 
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": "Too many requests",
-                    "retry_after": 60
+                    "retry_after": reset_seconds
                 },
-                headers={"Retry-After": "60"}
+                headers={**rate_limit_headers, "Retry-After": str(reset_seconds)}
             )
+            return await response(scope, receive, send)
 
         # Check for SQL injection patterns in query parameters
         if self._check_sql_injection_patterns(request):
@@ -161,68 +247,94 @@ class SuspiciousActivityMiddleware(BaseHTTPMiddleware):
                 user_agent=request.headers.get("user-agent"),
             )
 
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"detail": "Invalid request"}
             )
+            return await response(scope, receive, send)
 
-        response = await call_next(request)
-
-        return response
+        raw_rate_limit_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in rate_limit_headers.items()
+        ]
 
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address."""
-        if "x-forwarded-for" in request.headers:
-            return request.headers["x-forwarded-for"].split(",")[0].strip()
-        elif "x-real-ip" in request.headers:
-            return request.headers["x-real-ip"]
-        elif request.client:
-            return request.client.host
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + raw_rate_limit_headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _record_request(self, client_ip: str) -> Tuple[int, int]:
+        """
+        Record a request from ``client_ip``.
+
+        Returns the number of requests in the current window, including this
+        one, and the seconds until the oldest of them leaves the window.
+        """
+        if self.redis is not None:
+            now_ms = int(time.time() * 1000)
+            try:
+                count, oldest_ms = await self._window_script(
+                    keys=[f"sa:{{{client_ip}}}"],
+                    args=[now_ms, self.WINDOW_SECONDS * 1000, f"{now_ms}:{secrets.token_hex(4)}"],
+                )
+            except Exception as e:
+                # Fall back to the per-process window while Redis is unreachable
+                logger.warning("Suspicious activity window check failed", error=str(e))
+            else:
+                reset_ms = int(oldest_ms) + self.WINDOW_SECONDS * 1000 - now_ms
+                return int(count), max(1, math.ceil(reset_ms / 1000))
+
+        now = time.monotonic()
+        window = self._windows.get(client_ip)
+        if window is None:
+            window = deque(maxlen=self.max_requests_per_minute + 1)
+            self._windows[client_ip] = window
+            if len(self._windows) > self.MAX_TRACKED_IPS:
+                self._windows.popitem(last=False)
         else:
-            return "unknown"
+            self._windows.move_to_end(client_ip)
 
-    def _check_sql_injection_patterns(self, request: Request) -> bool:
-        """Check for basic SQL injection patterns."""
-        suspicious_patterns = [
-            "union select",
-            "drop table",
-            "delete from",
-            "insert into",
-            "update set",
-            "--",
-            "/*",
-            "*/",
-            "xp_",
-            "sp_",
-            "exec(",
-            "execute(",
-        ]
+        # Drop entries older than the window; amortised O(1) per request
+        cutoff = now - self.WINDOW_SECONDS
+        while window and window[0] <= cutoff:
+            window.popleft()
+        window.append(now)
 
-        # Check query parameters
-        query_string = str(request.query_params).lower()
-        for pattern in suspicious_patterns:
-            if pattern in query_string:
-                return True
+        return len(window), max(1, math.ceil(window[0] + self.WINDOW_SECONDS - now))
 
-        return False
+    def _check_sql_injection_patterns(self, request: Request) -> bool:
+        """Check for basic SQL injection patterns."""
+        # Scan decoded names and values; the encoded query string hides
+        # spaces and comment markers behind percent-escapes
+        return any(
+            _SQL_INJECTION_PATTERN.search(item)
+            for pair in request.query_params.multi_items()
+            for item in pair
+        )
 
 
-class CSRFProtectionMiddleware(BaseHTTPMiddleware):
+class CSRFProtectionMiddleware:
     """CSRF protection for state-changing operations."""
 
     def __init__(self, app, exempt_paths: Optional[list] = None):
-        super().__init__(app)
-        self.exempt_paths = exempt_paths or ["/docs", "/redoc", "/openapi.json", "/health"]
+        self.app = app
+        # Tuple so a single str.startswith() call checks every prefix
+        self.exempt_paths = tuple(exempt_paths or _UNSCREENED_PATHS)
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope, receive, send):
         # Skip CSRF check for safe methods and exempt paths
-        if (request.method in ["GET", "HEAD", "OPTIONS"] or
-            any(request.url.path.startswith(path) for path in self.exempt_paths)):
-            return await call_next(request)
+        if (scope["type"] != "http" or
+            scope["method"] in _SAFE_METHODS or
+            scope["path"].startswith(self.exempt_paths)):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
 
         # For API requests with Authorization header, skip CSRF
         if request.headers.get("authorization"):
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         # Check for CSRF token in header
         csrf_token = request.headers.get("x-csrf-token")
@@ -231,31 +343,22 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
                 "CSRF token missing",
                 path=request.url.path,
                 method=request.method,
-                client_ip=self._get_client_ip(request),
+                client_ip=_get_client_ip(request),
             )
 
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "CSRF token required"}
             )
+            return await response(scope, receive, send)
 
         # In a real implementation, validate the CSRF token
         # For now, just check it's not empty
         if not csrf_token.strip():
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "Invalid CSRF token"}
             )
+            return await response(scope, receive, send)
 
-        response = await call_next(request)
-
-        return response
-
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address."""
-        if "x-forwarded-for" in request.headers:
-            return request.headers["x-forwarded-for"].split(",")[0].strip()
-        elif request.client:
-            return request.client.host
-        else:
-            return "unknown"
\ No newline at end of file
+        await self.app(scope, receive, send)
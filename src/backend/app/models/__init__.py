@@ -1,4 +1,11 @@
-"""Database models for the Loctician Booking System."""
+"""
+Database models for the Loctician Booking System.
+
+Relationships that list endpoints or batch jobs could touch per row are
+declared with ``lazy="raise_on_sql"``: they never load implicitly, and a
+query that needs them must ask for them with ``selectinload()`` or
+``joinedload()`` instead of issuing one SELECT per row.
+"""
 
 from app.models.user import User, UserProfile
 from app.models.service import Service, ServiceCategory
@@ -1,7 +1,7 @@
 """
 Booking-related models.
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
 from typing import List, Optional
 
@@ -13,14 +13,24 @@ from sqlalchemy import (
     Numeric,
     String,
     Text,
+    func,
+    select,
 )
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
 from app.models.enums import BookingStatus, PaymentStatus
 from app.models.mixins import AuditableModel, BaseModel
 
+# Statuses a booking never leaves; none of them can be cancelled
+_TERMINAL_STATUSES = frozenset({
+    BookingStatus.CANCELLED,
+    BookingStatus.COMPLETED,
+    BookingStatus.NO_SHOW,
+})
+
 
 class Booking(Base, AuditableModel):
     """Main booking model."""
@@ -126,19 +136,24 @@ class Booking(Base, AuditableModel):
     canceller: Mapped[Optional["User"]] = relationship(
         "User",
         foreign_keys=[cancelled_by],
+        lazy="raise_on_sql",
     )
 
-    # Additional services and products
+    # Additional services and products. Like state_changes and canceller,
+    # they are never loaded implicitly: use selectinload(), or computed_total
+    # for just the sum, instead of one query per booking.
     booking_services: Mapped[List["BookingService"]] = relationship(
         "BookingService",
         back_populates="booking",
         cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
 
     booking_products: Mapped[List["BookingProduct"]] = relationship(
         "BookingProduct",
         back_populates="booking",
         cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
 
     # State changes
@@ -146,6 +161,7 @@ class Booking(Base, AuditableModel):
         "BookingStateChange",
         back_populates="booking",
         cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
 
     # Constraints
@@ -163,31 +179,57 @@ class Booking(Base, AuditableModel):
     @property
     def is_past(self) -> bool:
         """Check if booking is in the past."""
-        return self.appointment_start < datetime.utcnow()
+        # appointment_start is timezone-aware, so compare against aware UTC
+        return self.appointment_start < datetime.now(timezone.utc)
 
     @property
     def is_upcoming(self) -> bool:
         """Check if booking is upcoming."""
-        return not self.is_past and self.is_active
+        # Status compare first; it is cheaper than reading the clock
+        return self.is_active and not self.is_past
 
     @property
     def can_be_cancelled(self) -> bool:
         """Check if booking can be cancelled."""
-        return self.is_active and not self.is_past
+        # Status lookup first; it is cheaper than reading the clock
+        if self.status in _TERMINAL_STATUSES:
+            return False
+        return not self.is_past
 
     def calculate_total(self) -> Decimal:
         """Calculate total amount including services and products."""
         total = self.service_price + self.additional_charges - self.discount_amount
 
-        # Add booking services
-        for booking_service in self.booking_services:
-            total += booking_service.total_price
-
-        # Add booking products
-        for booking_product in self.booking_products:
-            total += booking_product.total_price
-
-        return total
+        # Add booking services and products
+        total = sum((item.total_price for item in self.booking_services), total)
+        return sum((item.total_price for item in self.booking_products), total)
+
+    @hybrid_property
+    def computed_total(self) -> Decimal:
+        """Total amount including services and products."""
+        return self.calculate_total()
+
+    @computed_total.inplace.expression
+    @classmethod
+    def _computed_total_expression(cls):
+        """Compute the total in SQL, without loading the related rows."""
+        services_total = (
+            select(func.coalesce(func.sum(BookingService.total_price), 0))
+            .where(BookingService.booking_id == cls.id)
+            .scalar_subquery()
+        )
+        products_total = (
+            select(func.coalesce(func.sum(BookingProduct.total_price), 0))
+            .where(BookingProduct.booking_id == cls.id)
+            .scalar_subquery()
+        )
+        return (
+            cls.service_price
+            + cls.additional_charges
+            - cls.discount_amount
+            + services_total
+            + products_total
+        )
 
     def __repr__(self) -> str:
         return f"<Booking(id={self.id}, number={self.booking_number}, status={self.status})>"
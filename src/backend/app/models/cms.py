@@ -1,15 +1,16 @@
 """
 CMS page model.
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, JSON, String, Text
+from sqlalchemy import Boolean, DateTime, ForeignKey, JSON, String, Text, and_, case, func, or_
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base, IS_POSTGRES
-from app.models.enums import PageType
+from app.models.enums import PageType, pg_enum
 from app.models.mixins import BaseModel
 
 
@@ -22,7 +23,9 @@ class CMSPage(Base, BaseModel):
     slug: Mapped[str] = mapped_column(String(200), unique=True, nullable=False)
     content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     excerpt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    page_type: Mapped[PageType] = mapped_column(default=PageType.PAGE, nullable=False)
+    page_type: Mapped[PageType] = mapped_column(
+        pg_enum(PageType, "page_type"), default=PageType.PAGE, nullable=False
+    )
 
     # SEO
     meta_title: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
@@ -52,15 +55,15 @@ class CMSPage(Base, BaseModel):
     )
 
     # Relationships
-    author: Mapped[Optional["User"]] = relationship("User")
+    author: Mapped[Optional["User"]] = relationship("User", lazy="raise_on_sql")
 
-    @property
+    @hybrid_property
     def is_currently_published(self) -> bool:
         """Check if page is currently published."""
         if not self.is_published:
             return False
 
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
 
         # Check publish_at
         if self.publish_at and self.publish_at > now:
@@ -72,7 +75,18 @@ class CMSPage(Base, BaseModel):
 
         return True
 
-    @property
+    @is_currently_published.inplace.expression
+    @classmethod
+    def _is_currently_published_expression(cls):
+        """Filter on bare columns so the publication window index applies."""
+        now = func.now()
+        return and_(
+            cls.is_published == True,
+            or_(cls.publish_at.is_(None), cls.publish_at <= now),
+            or_(cls.unpublish_at.is_(None), cls.unpublish_at > now),
+        )
+
+    @hybrid_property
     def status_display(self) -> str:
         """Get display status."""
         if not self.is_published:
@@ -82,5 +96,15 @@ class CMSPage(Base, BaseModel):
         else:
             return "Scheduled"
 
+    @status_display.inplace.expression
+    @classmethod
+    def _status_display_expression(cls):
+        """Compute the display status in SQL."""
+        return case(
+            (cls.is_published == False, "Draft"),
+            (cls.is_currently_published, "Published"),
+            else_="Scheduled",
+        )
+
     def __repr__(self) -> str:
         return f"<CMSPage(id={self.id}, title={self.title}, type={self.page_type})>"
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Email template and queue models.
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 from sqlalchemy import DateTime, ForeignKey, Integer, JSON, String, Text
@@ -9,8 +9,8 @@ from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base, IS_POSTGRES
-from app.models.enums import EmailStatus, TemplateType
-from app.models.mixins import BaseModel, UUIDMixin
+from app.models.enums import EmailStatus, TemplateType, pg_enum
+from app.models.mixins import BaseModel, CreatedAtMixin, UUIDMixin
 
 
 JSON_TYPE = JSONB if IS_POSTGRES else JSON
@@ -22,7 +22,9 @@ class EmailTemplate(Base, BaseModel):
     __tablename__ = "email_templates"
 
     name: Mapped[str] = mapped_column(String(100), nullable=False)
-    template_type: Mapped[TemplateType] = mapped_column(nullable=False)
+    template_type: Mapped[TemplateType] = mapped_column(
+        pg_enum(TemplateType, "template_type"), nullable=False
+    )
     subject: Mapped[str] = mapped_column(String(200), nullable=False)
     html_content: Mapped[str] = mapped_column(Text, nullable=False)
     text_content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -41,13 +43,13 @@ class EmailTemplate(Base, BaseModel):
     )
 
     # Relationships
-    creator: Mapped[Optional["User"]] = relationship("User")
+    creator: Mapped[Optional["User"]] = relationship("User", lazy="raise_on_sql")
 
     def __repr__(self) -> str:
         return f"<EmailTemplate(id={self.id}, name={self.name}, type={self.template_type})>"
 
 
-class EmailQueue(Base, UUIDMixin):
+class EmailQueue(Base, UUIDMixin, CreatedAtMixin):
     """Email queue for managing email delivery."""
 
     __tablename__ = "email_queue"
@@ -83,7 +85,9 @@ class EmailQueue(Base, UUIDMixin):
     )
 
     # Status tracking
-    status: Mapped[EmailStatus] = mapped_column(default=EmailStatus.QUEUED, nullable=False)
+    status: Mapped[EmailStatus] = mapped_column(
+        pg_enum(EmailStatus, "email_status"), default=EmailStatus.QUEUED, nullable=False
+    )
     attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     max_attempts: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
 
@@ -102,14 +106,13 @@ class EmailQueue(Base, UUIDMixin):
     # External provider info
     provider_message_id: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
 
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False
-    )
-
     # Relationships
-    template: Mapped[Optional["EmailTemplate"]] = relationship("EmailTemplate")
-    user: Mapped[Optional["User"]] = relationship("User")
-    booking: Mapped[Optional["Booking"]] = relationship("Booking")
+    template: Mapped[Optional["EmailTemplate"]] = relationship(
+        "EmailTemplate",
+        lazy="raise_on_sql",
+    )
+    user: Mapped[Optional["User"]] = relationship("User", lazy="raise_on_sql")
+    booking: Mapped[Optional["Booking"]] = relationship("Booking", lazy="raise_on_sql")
 
     @property
     def can_retry(self) -> bool:
@@ -122,14 +125,14 @@ class EmailQueue(Base, UUIDMixin):
     def mark_sent(self, provider_message_id: Optional[str] = None) -> None:
         """Mark email as sent."""
         self.status = EmailStatus.SENT
-        self.sent_at = datetime.utcnow()
+        self.sent_at = datetime.now(timezone.utc)
         if provider_message_id:
             self.provider_message_id = provider_message_id
 
     def mark_failed(self, error_message: str) -> None:
         """Mark email as failed."""
         self.status = EmailStatus.FAILED
-        self.failed_at = datetime.utcnow()
+        self.failed_at = datetime.now(timezone.utc)
         self.error_message = error_message
         self.attempts += 1
 
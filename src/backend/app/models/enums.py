@@ -2,6 +2,25 @@
 Database enums for the Loctician Booking System.
 """
 import enum
+from typing import Type
+
+from sqlalchemy.dialects.postgresql import ENUM
+
+
+def pg_enum(enum_class: Type[enum.Enum], name: str) -> ENUM:
+    """
+    Column type for an enum backed by an existing PostgreSQL enum type.
+
+    Members are stored by value (``"queued"``, not ``"QUEUED"``) to match the
+    type created in the SQL schema; the type itself is never created from the
+    models. Other databases fall back to VARCHAR.
+    """
+    return ENUM(
+        enum_class,
+        name=name,
+        create_type=False,
+        values_callable=lambda members: [member.value for member in members],
+    )
 
 
 class UserRole(str, enum.Enum):
@@ -1,10 +1,12 @@
 """
 GDPR compliance models for data protection and consent management.
 """
-from datetime import datetime
+import base64
+import secrets
+from datetime import datetime, timezone
 from typing import Dict, List, Optional
 
-from sqlalchemy import DateTime, ForeignKey, JSON, String, Text
+from sqlalchemy import DateTime, ForeignKey, Index, JSON, String, Text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -12,6 +14,12 @@ from app.core.database import Base, IS_POSTGRES
 from app.models.mixins import BaseModel, UUIDMixin
 
 
+JSON_TYPE = JSONB if IS_POSTGRES else JSON
+
+# 96 random bytes encode to the 128 characters unsubscribe_token holds
+_UNSUBSCRIBE_TOKEN_BYTES = 96
+
+
 class EmailConsent(Base, UUIDMixin):
     """Track email consent and preferences for GDPR compliance."""
 
@@ -54,7 +62,11 @@ class EmailConsent(Base, UUIDMixin):
     )
 
     # Relationships
-    user: Mapped["User"] = relationship("User", back_populates="email_consent")
+    user: Mapped["User"] = relationship(
+        "User",
+        back_populates="email_consent",
+        lazy="raise_on_sql",
+    )
 
     @property
     def has_marketing_consent(self) -> bool:
@@ -77,7 +89,7 @@ class EmailConsent(Base, UUIDMixin):
         self.booking_notifications = False
         self.appointment_reminders = False
         self.service_updates = False
-        self.withdrawn_at = datetime.utcnow()
+        self.withdrawn_at = datetime.now(timezone.utc)
         self.withdrawal_reason = reason
 
     def __repr__(self) -> str:
@@ -115,13 +127,23 @@ class EmailUnsubscribe(Base, UUIDMixin):
     user_agent: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # Relationships
-    user: Mapped[Optional["User"]] = relationship("User")
+    user: Mapped[Optional["User"]] = relationship("User", lazy="raise_on_sql")
 
     @classmethod
     def generate_token(cls) -> str:
         """Generate secure unsubscribe token."""
-        import secrets
-        return secrets.token_urlsafe(96)
+        return secrets.token_urlsafe(_UNSUBSCRIBE_TOKEN_BYTES)
+
+    @classmethod
+    def generate_tokens(cls, count: int) -> List[str]:
+        """Generate many unsubscribe tokens from a single random read."""
+        raw = secrets.token_bytes(_UNSUBSCRIBE_TOKEN_BYTES * count)
+        return [
+            base64.urlsafe_b64encode(
+                raw[offset:offset + _UNSUBSCRIBE_TOKEN_BYTES]
+            ).rstrip(b"=").decode("ascii")
+            for offset in range(0, len(raw), _UNSUBSCRIBE_TOKEN_BYTES)
+        ]
 
     def __repr__(self) -> str:
         return f"<EmailUnsubscribe(email={self.email}, type={self.email_type})>"
@@ -136,15 +158,13 @@ class DataRetentionPolicy(Base, BaseModel):
     description: Mapped[str] = mapped_column(Text, nullable=False)
 
     # Data types covered
-    _JSONType = JSONB if IS_POSTGRES else JSON
-
-    data_types: Mapped[List[str]] = mapped_column(_JSONType, nullable=False)
+    data_types: Mapped[List[str]] = mapped_column(JSON_TYPE, nullable=False)
 
     # Retention periods (in days)
     retention_period_days: Mapped[int] = mapped_column(nullable=False)
 
     # Deletion rules
-    deletion_criteria: Mapped[Dict[str, str]] = mapped_column(_JSONType, nullable=False)
+    deletion_criteria: Mapped[Dict[str, str]] = mapped_column(JSON_TYPE, nullable=False)
     auto_delete_enabled: Mapped[bool] = mapped_column(default=True, nullable=False)
 
     # Legal basis
@@ -153,6 +173,11 @@ class DataRetentionPolicy(Base, BaseModel):
 
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
 
+    # Policies are looked up by covered data type (data_types @> '["bookings"]')
+    __table_args__ = (
+        Index("ix_data_retention_types_gin", "data_types", postgresql_using="gin"),
+    )
+
     def __repr__(self) -> str:
         return f"<DataRetentionPolicy(name={self.policy_name}, retention={self.retention_period_days} days)>"
 
@@ -171,7 +196,7 @@ class DataDeletionLog(Base, UUIDMixin):
     # What was deleted
     data_type: Mapped[str] = mapped_column(String(100), nullable=False)
     table_name: Mapped[str] = mapped_column(String(100), nullable=False)
-    record_ids: Mapped[List[str]] = mapped_column(_JSONType, nullable=False)
+    record_ids: Mapped[List[str]] = mapped_column(JSON_TYPE, nullable=False)
     record_count: Mapped[int] = mapped_column(nullable=False)
 
     # Deletion context
@@ -197,9 +222,39 @@ class DataDeletionLog(Base, UUIDMixin):
     verification_notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # Relationships
-    user: Mapped[Optional["User"]] = relationship("User", foreign_keys=[user_id])
-    deleted_by_user: Mapped[Optional["User"]] = relationship("User", foreign_keys=[deleted_by])
-    policy: Mapped[Optional["DataRetentionPolicy"]] = relationship("DataRetentionPolicy")
+    user: Mapped[Optional["User"]] = relationship(
+        "User",
+        foreign_keys=[user_id],
+        lazy="raise_on_sql",
+    )
+    deleted_by_user: Mapped[Optional["User"]] = relationship(
+        "User",
+        foreign_keys=[deleted_by],
+        lazy="raise_on_sql",
+    )
+    policy: Mapped[Optional["DataRetentionPolicy"]] = relationship(
+        "DataRetentionPolicy",
+        lazy="raise_on_sql",
+    )
+
+    # "Was this record deleted?" is a containment query on record_ids;
+    # jsonb_path_ops only supports @> but is about half the size of the
+    # default opclass. The log is append-only, so deleted_at follows the
+    # physical row order and a BRIN index serves date-range audit reads.
+    __table_args__ = (
+        Index(
+            "ix_data_deletion_record_ids_gin",
+            "record_ids",
+            postgresql_using="gin",
+            postgresql_ops={"record_ids": "jsonb_path_ops"},
+        ),
+        Index(
+            "ix_data_deletion_deleted_at_brin",
+            "deleted_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+        ),
+    )
 
     def __repr__(self) -> str:
         return f"<DataDeletionLog(data_type={self.data_type}, count={self.record_count})>"
@@ -243,8 +298,26 @@ class ConsentAuditLog(Base, UUIDMixin):
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # Relationships
-    user: Mapped["User"] = relationship("User", foreign_keys=[user_id])
-    changed_by_user: Mapped[Optional["User"]] = relationship("User", foreign_keys=[changed_by])
+    user: Mapped["User"] = relationship(
+        "User",
+        foreign_keys=[user_id],
+        lazy="raise_on_sql",
+    )
+    changed_by_user: Mapped[Optional["User"]] = relationship(
+        "User",
+        foreign_keys=[changed_by],
+        lazy="raise_on_sql",
+    )
+
+    # Append-only like DataDeletionLog: BRIN on the insert-ordered timestamp
+    __table_args__ = (
+        Index(
+            "ix_consent_audit_changed_at_brin",
+            "changed_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+        ),
+    )
 
     def __repr__(self) -> str:
         return f"<ConsentAuditLog(user_id={self.user_id}, type={self.consent_type}, changed_at={self.changed_at})>"
\ No newline at end of file
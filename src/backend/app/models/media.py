@@ -37,7 +37,7 @@ class MediaFile(Base, UUIDMixin):
     )
 
     # Relationships
-    uploader: Mapped[Optional["User"]] = relationship("User")
+    uploader: Mapped[Optional["User"]] = relationship("User", lazy="raise_on_sql")
 
     @property
     def is_image(self) -> bool:
@@ -1,38 +1,79 @@
 """
 Common mixins for database models.
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any
 from uuid import uuid4
 
-from sqlalchemy import DateTime, func
+from sqlalchemy import DDL, DateTime, FetchedValue, event, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app.core.database import IS_POSTGRES
+
+
+_UPDATED_AT_FUNCTION_DDL = DDL(
+    "CREATE OR REPLACE FUNCTION update_updated_at_column() RETURNS TRIGGER AS $$ "
+    "BEGIN NEW.updated_at = NOW(); RETURN NEW; END; $$ LANGUAGE plpgsql"
+).execute_if(dialect="postgresql")
 
-class TimestampMixin:
-    """Mixin for created_at and updated_at timestamps."""
+
+class CreatedAtMixin:
+    """Mixin for a created_at timestamp, for append-only tables."""
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
         nullable=False,
     )
+
+
+class UpdatedAtMixin:
+    """Mixin for an updated_at timestamp."""
+
+    # On PostgreSQL the update_updated_at_column() BEFORE UPDATE trigger
+    # (migration 021) bumps the column, so UPDATEs only carry the columns
+    # that changed; other databases set it from the ORM.
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
-        onupdate=func.now(),
+        onupdate=None if IS_POSTGRES else func.now(),
+        server_onupdate=FetchedValue() if IS_POSTGRES else None,
         nullable=False,
     )
 
+    @classmethod
+    def __declare_last__(cls) -> None:
+        # Tables created from the models get the same trigger as migration 021
+        table = cls.__table__
+        if "updated_at" not in table.c or table.c.updated_at.server_onupdate is None:
+            return
+        event.listen(table, "after_create", _UPDATED_AT_FUNCTION_DDL)
+        event.listen(
+            table,
+            "after_create",
+            DDL(
+                "CREATE OR REPLACE TRIGGER tr_%(table)s_updated_at BEFORE UPDATE ON %(fullname)s "
+                "FOR EACH ROW EXECUTE FUNCTION update_updated_at_column()"
+            ).execute_if(dialect="postgresql"),
+        )
+
+
+class TimestampMixin(CreatedAtMixin, UpdatedAtMixin):
+    """Mixin for created_at and updated_at timestamps."""
+
 
 class UUIDMixin:
     """Mixin for UUID primary key."""
 
+    # PostgreSQL generates the key (built-in gen_random_uuid()), so inserts
+    # carry no client-side id and batch through insertmanyvalues with
+    # RETURNING; other databases fall back to a Python uuid4().
     id: Mapped[str] = mapped_column(
         UUID(as_uuid=False),
         primary_key=True,
-        default=lambda: str(uuid4()),
+        default=None if IS_POSTGRES else lambda: str(uuid4()),
+        server_default=func.gen_random_uuid() if IS_POSTGRES else None,
         nullable=False,
     )
 
@@ -53,7 +94,7 @@ class SoftDeleteMixin:
 
     def soft_delete(self) -> None:
         """Mark the record as deleted."""
-        self.deleted_at = datetime.utcnow()
+        self.deleted_at = datetime.now(timezone.utc)
 
     def restore(self) -> None:
         """Restore a soft deleted record."""
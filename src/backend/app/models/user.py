@@ -81,12 +81,16 @@ class User(Base, FullAuditModel):
 
     # Availability overrides
     availability_overrides: Mapped[List["AvailabilityOverride"]] = relationship(
-        "AvailabilityOverride", back_populates="loctician"
+        "AvailabilityOverride",
+        foreign_keys="AvailabilityOverride.loctician_id",
+        back_populates="loctician"
     )
 
     # Calendar events
     calendar_events: Mapped[List["CalendarEvent"]] = relationship(
-        "CalendarEvent", back_populates="loctician"
+        "CalendarEvent",
+        foreign_keys="CalendarEvent.loctician_id",
+        back_populates="loctician"
     )
 
     @property
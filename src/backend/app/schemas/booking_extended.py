@@ -1,6 +1,7 @@
 """
 Extended booking schemas supporting both guest and authenticated users.
 """
+import re
 from datetime import datetime, date as DateType, time
 from decimal import Decimal
 from typing import List, Optional, Union
@@ -8,6 +9,8 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field, validator, root_validator
 
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 
 # Guest Contact Information
 class GuestContactInfo(BaseModel):
@@ -19,8 +22,7 @@ class GuestContactInfo(BaseModel):
 
     @validator('email')
     def validate_email(cls, v):
-        import re
-        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', v):
+        if not _EMAIL_PATTERN.match(v):
             raise ValueError('Invalid email format')
         return v.lower()
 
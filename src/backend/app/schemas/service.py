@@ -1,11 +1,14 @@
 """
 Service and service category schema definitions.
 """
+import re
 from decimal import Decimal
 from typing import List, Optional
 
 from pydantic import BaseModel, Field, validator
 
+_SLUG_PATTERN = re.compile(r'^[a-z0-9-]+$')
+
 
 # Service Category Schemas
 class ServiceCategoryBase(BaseModel):
@@ -70,8 +73,7 @@ class ServiceBase(BaseModel):
     def validate_slug(cls, v):
         if v is not None:
             # Simple slug validation - only lowercase, numbers, and hyphens
-            import re
-            if not re.match(r'^[a-z0-9-]+$', v):
+            if not _SLUG_PATTERN.match(v):
                 raise ValueError('Slug must contain only lowercase letters, numbers, and hyphens')
         return v
 
@@ -105,8 +107,7 @@ class ServiceUpdate(BaseModel):
     @validator('slug')
     def validate_slug(cls, v):
         if v is not None:
-            import re
-            if not re.match(r'^[a-z0-9-]+$', v):
+            if not _SLUG_PATTERN.match(v):
                 raise ValueError('Slug must contain only lowercase letters, numbers, and hyphens')
         return v
 
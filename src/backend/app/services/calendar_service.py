@@ -25,7 +25,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.config import settings
-from app.core.database import get_db_session
+from app.core.database import IS_POSTGRES, get_db_session
 from app.models.availability import AvailabilityPattern, AvailabilityOverride
 from app.models.booking import Booking
 from app.models.calendar_event import CalendarEvent
@@ -55,6 +55,20 @@ logger = structlog.get_logger(__name__)
 DANISH_TZ = pytz.timezone(settings.DEFAULT_TIMEZONE)
 
 
+def _booking_overlaps(start_time: datetime, end_time: datetime):
+    """Condition for bookings overlapping [start_time, end_time)."""
+    if IS_POSTGRES:
+        # Matches the indexed tstzrange expression (idx_bookings_date_range)
+        # so the lookup is a GiST range search
+        return func.tstzrange(Booking.appointment_start, Booking.appointment_end).op("&&")(
+            func.tstzrange(start_time, end_time)
+        )
+    return and_(
+        Booking.appointment_start < end_time,
+        Booking.appointment_end > start_time
+    )
+
+
 class DateTimeHelper:
     """Helper class for date/time operations with Danish timezone support."""
 
@@ -176,6 +190,48 @@ class AvailabilityEngine:
 
         return pattern.start_time, pattern.end_time
 
+    @staticmethod
+    def resolve_base_availability(
+        patterns: List[AvailabilityPattern],
+        dates: List[date]
+    ) -> Dict[date, Tuple[time, time]]:
+        """
+        Resolve base availability for many dates from already loaded patterns.
+
+        Applies the same rule as get_base_availability (latest active pattern
+        effective on the date wins) without a query per date.
+
+        Args:
+            patterns: Active availability patterns of one loctician
+            dates: Dates to resolve
+
+        Returns:
+            Dictionary mapping available dates to (start_time, end_time)
+        """
+        # Pattern fields bucketed by day of week (Sunday=0), latest first
+        by_day: Dict[int, List[Tuple[date, Optional[date], time, time]]] = {}
+        for pattern in sorted(patterns, key=lambda p: p.effective_from, reverse=True):
+            by_day.setdefault(pattern.day_of_week, []).append((
+                pattern.effective_from,
+                pattern.effective_until,
+                pattern.start_time,
+                pattern.end_time,
+            ))
+
+        resolved = {}
+        for target_date in dates:
+            # Python weekday is Monday=0; patterns use Sunday=0
+            for effective_from, effective_until, start, end in by_day.get(
+                (target_date.weekday() + 1) % 7, ()
+            ):
+                if effective_from <= target_date and (
+                    effective_until is None or effective_until >= target_date
+                ):
+                    resolved[target_date] = (start, end)
+                    break
+
+        return resolved
+
     async def get_availability_override(
         self,
         loctician_id: str,
@@ -233,10 +289,7 @@ class AvailabilityEngine:
                 BookingStatus.IN_PROGRESS
             ]),
             # Check for time overlap
-            and_(
-                Booking.appointment_start < end_time,
-                Booking.appointment_end > start_time
-            )
+            _booking_overlaps(start_time, end_time)
         ]
 
         if exclude_booking_id:
@@ -1493,11 +1546,16 @@ class CalendarService:
         overrides = overrides_result.scalars().all()
 
         # Build working hours dictionary
+        overrides_by_date = {o.date: o for o in overrides}
+        base_hours_by_date = self.availability_engine.resolve_base_availability(
+            patterns,
+            [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        )
         working_hours = {}
         current_date = start_date
         while current_date <= end_date:
             # Check for override first
-            override = next((o for o in overrides if o.date == current_date), None)
+            override = overrides_by_date.get(current_date)
             day_key = current_date.strftime("%Y-%m-%d")
 
             if override:
@@ -1509,9 +1567,7 @@ class CalendarService:
                 # If override is not available, no working hours for that day
             else:
                 # Use pattern
-                base_hours = await self.availability_engine.get_base_availability(
-                    loctician_id, current_date, session
-                )
+                base_hours = base_hours_by_date.get(current_date)
                 if base_hours:
                     working_hours[day_key] = {
                         "start": base_hours[0].isoformat(),
@@ -4,7 +4,7 @@ Handles email templating, sending, queuing, and automation workflows.
 """
 import asyncio
 import smtplib
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Any, Dict, List, Optional, Tuple
@@ -12,7 +12,7 @@ from typing import Any, Dict, List, Optional, Tuple
 import aiosmtplib
 import structlog
 from jinja2 import BaseLoader, Environment, Template
-from sqlalchemy import and_, or_, select, update
+from sqlalchemy import and_, bindparam, func, literal_column, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -25,6 +25,28 @@ from app.models.user import User
 
 logger = structlog.get_logger(__name__)
 
+# Queue status changes are written with Core statements on the table so
+# one statement covers a whole chunk
+_EMAIL_QUEUE = EmailQueue.__table__
+_STATUS_UPDATE_CHUNK = 500
+# Emails are claimed, sent and recorded this many at a time, so a crash
+# leaves at most one chunk in the sending state
+_SEND_CHUNK = 10
+# Failed emails are rescheduled with a linear backoff of five minutes per
+# attempt instead of being picked up again on the next cycle
+_MARK_EMAIL_FAILED_STMT = (
+    update(_EMAIL_QUEUE)
+    .where(_EMAIL_QUEUE.c.id == bindparam("b_id"))
+    .values(
+        status=EmailStatus.FAILED,
+        failed_at=func.now(),
+        error_message=bindparam("b_error"),
+        attempts=_EMAIL_QUEUE.c.attempts + 1,
+        scheduled_at=func.now()
+        + literal_column("interval '5 minutes'") * (_EMAIL_QUEUE.c.attempts + 1),
+    )
+)
+
 
 class EmailTemplateRenderer:
     """Renders email templates with variables substitution."""
@@ -368,8 +390,7 @@ class EmailService:
             template_variables=template_variables,
             user_id=user_id,
             booking_id=booking_id,
-            scheduled_at=scheduled_at or datetime.utcnow(),
-            created_at=datetime.utcnow()
+            scheduled_at=scheduled_at or datetime.now(timezone.utc)
         )
 
         session.add(queue_entry)
@@ -405,13 +426,15 @@ class EmailService:
             async with get_db_session() as session:
                 return await self.process_email_queue(batch_size, session)
 
-        # Get pending emails
+        # Get pending emails and failed ones with attempts left; the status
+        # predicate matches the partial index idx_email_queue_due
         result = await session.execute(
             select(EmailQueue)
             .where(
                 and_(
-                    EmailQueue.status == EmailStatus.QUEUED,
-                    EmailQueue.scheduled_at <= datetime.utcnow()
+                    EmailQueue.status.in_([EmailStatus.QUEUED, EmailStatus.FAILED]),
+                    EmailQueue.attempts < EmailQueue.max_attempts,
+                    EmailQueue.scheduled_at <= func.now()
                 )
             )
             .limit(batch_size)
@@ -419,41 +442,14 @@ class EmailService:
         )
 
         pending_emails = result.scalars().all()
-        processed_count = 0
-
-        for email in pending_emails:
-            try:
-                # Mark as sending
-                email.status = EmailStatus.SENDING
-                await session.commit()
-
-                # Send email
-                success, error_message = await self.sender.send_email(
-                    to_email=email.to_email,
-                    to_name=email.to_name,
-                    subject=email.subject,
-                    html_content=email.html_content,
-                    text_content=email.text_content,
-                    from_email=email.from_email,
-                    from_name=email.from_name
-                )
-
-                if success:
-                    email.mark_sent()
-                    processed_count += 1
-                else:
-                    email.mark_failed(error_message or "Unknown error")
+        if not pending_emails:
+            return 0
 
-                await session.commit()
-
-            except Exception as e:
-                logger.error(
-                    "Email processing failed",
-                    email_id=email.id,
-                    error=str(e)
-                )
-                email.mark_failed(str(e))
-                await session.commit()
+        processed_count = 0
+        for start in range(0, len(pending_emails), _SEND_CHUNK):
+            processed_count += await self._send_email_chunk(
+                session, pending_emails[start:start + _SEND_CHUNK]
+            )
 
         logger.info(
             "Email queue processed",
@@ -463,6 +459,107 @@ class EmailService:
 
         return processed_count
 
+    async def _send_email_chunk(self, session: AsyncSession, emails: List[EmailQueue]) -> int:
+        """
+        Claim, send and record one chunk of queued emails.
+
+        Only the entries this call moves to sending are sent, so concurrent
+        workers that read the same rows never send an email twice. Entries
+        claimed but left without a recorded outcome (an exception,
+        cancellation or failed commit) are put back to queued.
+        """
+        claimed_ids: List[str] = []
+        recorded = False
+
+        try:
+            claimed_ids = await self._claim_emails(session, [email.id for email in emails])
+            await session.commit()
+
+            sent_ids: List[str] = []
+            failures: List[Dict[str, str]] = []
+
+            claimed = set(claimed_ids)
+            for email in emails:
+                if email.id not in claimed:
+                    # Another worker claimed it first
+                    continue
+                try:
+                    # Send email
+                    success, error_message = await self.sender.send_email(
+                        to_email=email.to_email,
+                        to_name=email.to_name,
+                        subject=email.subject,
+                        html_content=email.html_content,
+                        text_content=email.text_content,
+                        from_email=email.from_email,
+                        from_name=email.from_name
+                    )
+
+                    if success:
+                        sent_ids.append(email.id)
+                    else:
+                        failures.append({"b_id": email.id, "b_error": error_message or "Unknown error"})
+
+                except Exception as e:
+                    logger.error(
+                        "Email processing failed",
+                        email_id=email.id,
+                        error=str(e)
+                    )
+                    failures.append({"b_id": email.id, "b_error": str(e)})
+
+            # One UPDATE for the sent entries and one executemany for failures
+            await self._set_email_status(
+                session, sent_ids, status=EmailStatus.SENT, sent_at=func.now()
+            )
+            if failures:
+                await session.execute(_MARK_EMAIL_FAILED_STMT, failures)
+            await session.commit()
+            recorded = True
+            return len(sent_ids)
+
+        finally:
+            if claimed_ids and not recorded:
+                try:
+                    await session.rollback()
+                    await self._set_email_status(
+                        session, claimed_ids, status=EmailStatus.QUEUED
+                    )
+                    await session.commit()
+                except Exception as e:
+                    logger.error(
+                        "Failed to requeue claimed emails",
+                        email_ids=claimed_ids,
+                        error=str(e)
+                    )
+
+    @staticmethod
+    async def _claim_emails(session: AsyncSession, email_ids: List[str]) -> List[str]:
+        """Move still-pending entries to sending and return the ids claimed."""
+        result = await session.execute(
+            update(_EMAIL_QUEUE)
+            .where(
+                and_(
+                    _EMAIL_QUEUE.c.id.in_(email_ids),
+                    _EMAIL_QUEUE.c.status.in_([EmailStatus.QUEUED, EmailStatus.FAILED]),
+                    _EMAIL_QUEUE.c.attempts < _EMAIL_QUEUE.c.max_attempts,
+                )
+            )
+            .values(status=EmailStatus.SENDING)
+            .returning(_EMAIL_QUEUE.c.id)
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    async def _set_email_status(session: AsyncSession, email_ids: List[str], **values) -> None:
+        """Apply the same column values to many queue entries, in chunks."""
+        for start in range(0, len(email_ids), _STATUS_UPDATE_CHUNK):
+            await session.execute(
+                update(_EMAIL_QUEUE)
+                .where(_EMAIL_QUEUE.c.id.in_(email_ids[start:start + _STATUS_UPDATE_CHUNK]))
+                .values(**values)
+            )
+
     async def send_booking_confirmation(
         self,
         booking_id: str,
@@ -515,7 +612,7 @@ class EmailService:
             )
 
             # Update booking confirmation status
-            booking.confirmation_sent_at = datetime.utcnow()
+            booking.confirmation_sent_at = datetime.now(timezone.utc)
             await session.commit()
 
             return True
@@ -584,7 +681,7 @@ class EmailService:
             )
 
             # Update reminder status
-            booking.reminder_sent_at = datetime.utcnow()
+            booking.reminder_sent_at = datetime.now(timezone.utc)
             await session.commit()
 
             return True
@@ -695,7 +792,7 @@ class EmailService:
                 return await self.schedule_automatic_reminders(session)
 
         # Get confirmed bookings happening in 24 hours that haven't had reminders sent
-        reminder_time = datetime.utcnow() + timedelta(hours=24)
+        reminder_time = datetime.now(timezone.utc) + timedelta(hours=24)
         window_start = reminder_time - timedelta(minutes=30)
         window_end = reminder_time + timedelta(minutes=30)
 
@@ -15,6 +15,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = structlog.get_logger(__name__)
 
+# Local and private address prefixes, checked with one str.startswith() call
+_LOCAL_IP_PREFIXES = ('127.', '192.168.')
+
 
 class FraudDetectionService:
     """Service for detecting fraudulent activities and assessing payment risks."""
@@ -552,7 +555,7 @@ class FraudDetectionService:
         """Get country code from IP address (simplified implementation)."""
         # In production, use a proper GeoIP service like MaxMind
         # This is a simplified placeholder
-        if ip_address.startswith('127.') or ip_address.startswith('192.168.'):
+        if ip_address.startswith(_LOCAL_IP_PREFIXES):
             return 'DK'  # Local/private IP, assume Denmark
 
         # Add more sophisticated IP geolocation logic here
@@ -2,13 +2,20 @@
 Mollie Payment Service
 Complete integration with Mollie Payment API for payments and subscriptions.
 """
+import asyncio
+import copy
 import hmac
 import hashlib
 import json
 import logging
+import re
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 import structlog
@@ -35,6 +42,29 @@ logger = structlog.get_logger(__name__)
 MOLLIE_API_BASE_URL = "https://api.mollie.com/v2"
 MOLLIE_API_TIMEOUT = 30  # seconds
 
+# Available payment methods change rarely; cache them instead of calling the
+# Mollie API on every checkout page view.
+PAYMENT_METHODS_CACHE_TTL = 300  # seconds
+# Serve cached methods and refresh in the background once this share of the
+# TTL has elapsed, so requests never wait on the refresh.
+PAYMENT_METHODS_REFRESH_AHEAD = 0.9
+# The amount comes from public query parameters, so the per-amount cache is
+# an LRU of bounded size
+PAYMENT_METHODS_CACHE_SIZE = 256
+
+# Payment methods shown first to Danish customers, in display order
+DANISH_PREFERRED_METHODS = ('mobilepay', 'creditcard', 'applepay', 'klarna')
+_DANISH_PREFERRED_SET = frozenset(DANISH_PREFERRED_METHODS)
+
+# Letters (including Danish), whitespace, hyphens, dots and apostrophes
+_CUSTOMER_NAME_PATTERN = re.compile(r'^[a-zA-ZæøåÆØÅ\s\-\.\']+$')
+
+
+@lru_cache(maxsize=4)
+def _webhook_mac(secret: str) -> hmac.HMAC:
+    """HMAC state keyed with the webhook secret; callers copy() it per payload."""
+    return hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+
 
 class MollieServiceError(Exception):
     """Base exception for Mollie service errors."""
@@ -60,6 +90,20 @@ class MollieService:
         self.api_key = api_key or getattr(settings, 'MOLLIE_API_KEY', None)
         self.webhook_secret = webhook_secret or getattr(settings, 'MOLLIE_WEBHOOK_SECRET', None)
         self.disabled = False
+        # Shared client set at application startup; reuses pooled keep-alive
+        # connections instead of a new TLS handshake per API call
+        self.http_client: Optional[httpx.AsyncClient] = None
+
+        # Payment methods cache: amount key -> (fetched_at, methods), LRU order
+        self._methods_cache: "OrderedDict[Optional[Tuple[str, str]], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        # In-flight fetch per amount key; concurrent misses await the same task
+        self._methods_inflight: Dict[Optional[Tuple[str, str]], asyncio.Task] = {}
+        self._methods_refreshing: set = set()
+        # Strong references to refresh-ahead tasks until they finish
+        self._background_tasks: set = set()
+        # ETag of the response behind each cache entry, for conditional refreshes
+        self._methods_etags: Dict[Optional[Tuple[str, str]], str] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
 
         if not self.api_key:
             # During local development and automated tests we often do not
@@ -104,10 +148,27 @@ class MollieService:
         params: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Make authenticated request to Mollie API."""
+        response = await self._send_request(method, endpoint, data=data, params=params)
+        return self._parse_response(response)
+
+    async def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """Send an authenticated request to Mollie API and return the raw response."""
         self._ensure_configured()
         url = f"{MOLLIE_API_BASE_URL}/{endpoint.lstrip('/')}"
 
-        async with httpx.AsyncClient(timeout=MOLLIE_API_TIMEOUT) as client:
+        client_context = (
+            nullcontext(self.http_client)
+            if self.http_client is not None
+            else httpx.AsyncClient(timeout=MOLLIE_API_TIMEOUT)
+        )
+        async with client_context as client:
             try:
                 logger.debug(
                     "Making Mollie API request",
@@ -119,7 +180,7 @@ class MollieService:
                 response = await client.request(
                     method=method,
                     url=url,
-                    headers=self.headers,
+                    headers={**self.headers, **headers} if headers else self.headers,
                     json=data,
                     params=params
                 )
@@ -130,39 +191,43 @@ class MollieService:
                     response_size=len(response.content)
                 )
 
-                if response.status_code >= 400:
-                    error_data = {}
-                    try:
-                        error_data = response.json()
-                    except json.JSONDecodeError:
-                        pass
-
-                    error_message = error_data.get('detail', response.text)
-                    error_type = error_data.get('type', 'unknown')
-
-                    logger.error(
-                        "Mollie API error",
-                        status_code=response.status_code,
-                        error_message=error_message,
-                        error_type=error_type
-                    )
-
-                    raise MollieAPIError(
-                        message=error_message,
-                        status_code=response.status_code,
-                        error_type=error_type
-                    )
-
-                return response.json()
+                return response
 
             except httpx.RequestError as e:
                 logger.error("Mollie API request failed", error=str(e))
                 raise MollieServiceError(f"Request failed: {str(e)}")
-            except json.JSONDecodeError as e:
-                logger.error("Invalid JSON response from Mollie", error=str(e))
-                raise MollieServiceError("Invalid response format")
 
-    # Payment Operations
+    def _parse_response(self, response: httpx.Response) -> Dict[str, Any]:
+        """Raise MollieAPIError for error responses, otherwise decode the JSON body."""
+        if response.status_code >= 400:
+            error_data = {}
+            try:
+                error_data = response.json()
+            except json.JSONDecodeError:
+                pass
+
+            error_message = error_data.get('detail', response.text)
+            error_type = error_data.get('type', 'unknown')
+
+            logger.error(
+                "Mollie API error",
+                status_code=response.status_code,
+                error_message=error_message,
+                error_type=error_type
+            )
+
+            raise MollieAPIError(
+                message=error_message,
+                status_code=response.status_code,
+                error_type=error_type
+            )
+
+        try:
+            return response.json()
+        except json.JSONDecodeError as e:
+            logger.error("Invalid JSON response from Mollie", error=str(e))
+            raise MollieServiceError("Invalid response format")
+
     async def create_payment(
         self,
         payment_data: MolliePaymentCreate,
@@ -579,11 +644,9 @@ class MollieService:
                     logger.warning("Invalid webhook timestamp format")
                     return False
 
-            expected_signature = hmac.new(
-                self.webhook_secret.encode('utf-8'),
-                payload,
-                hashlib.sha256
-            ).hexdigest()
+            mac = _webhook_mac(self.webhook_secret).copy()
+            mac.update(payload)
+            expected_signature = mac.hexdigest()
 
             # Mollie uses SHA-256 with a specific format
             expected_signature = f"sha256={expected_signature}"
@@ -660,8 +723,7 @@ class MollieService:
                     return False
 
                 # Check for suspicious characters
-                import re
-                if not re.match(r'^[a-zA-ZæøåÆØÅ\s\-\.\']+$', customer_name):
+                if not _CUSTOMER_NAME_PATTERN.match(customer_name):
                     logger.warning("Customer name contains invalid characters", name=customer_name)
                     return False
 
@@ -695,7 +757,113 @@ class MollieService:
         return None
 
     async def list_payment_methods(self, amount: Optional[MollieAmount] = None) -> List[Dict[str, Any]]:
-        """List available payment methods with Danish support."""
+        """
+        List available payment methods with Danish support.
+
+        Results are cached per amount for PAYMENT_METHODS_CACHE_TTL seconds.
+        Concurrent misses share one API call, and entries close to expiry
+        are served while a background task refreshes them.
+        """
+        key = (amount.value, amount.currency) if amount else None
+
+        cached = self._methods_cache.get(key)
+        if cached is not None:
+            age = time.monotonic() - cached[0]
+            if age < PAYMENT_METHODS_CACHE_TTL:
+                self._methods_cache.move_to_end(key)
+                if (
+                    age >= PAYMENT_METHODS_CACHE_TTL * PAYMENT_METHODS_REFRESH_AHEAD
+                    and key not in self._methods_refreshing
+                ):
+                    self._methods_refreshing.add(key)
+                    task = asyncio.create_task(self._refresh_payment_methods(key, amount))
+                    self._background_tasks.add(task)
+                    task.add_done_callback(self._background_tasks.discard)
+                return copy.deepcopy(cached[1])
+
+        # Single flight per key: a slow fetch for one amount never blocks
+        # misses for another
+        task = self._methods_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load_payment_methods(key, amount))
+            self._methods_inflight[key] = task
+            task.add_done_callback(lambda _: self._methods_inflight.pop(key, None))
+
+        # Shielded so one cancelled caller does not cancel the shared fetch
+        methods = await asyncio.shield(task)
+        return copy.deepcopy(methods)
+
+    async def _load_payment_methods(
+        self, key: Optional[Tuple[str, str]], amount: Optional[MollieAmount]
+    ) -> List[Dict[str, Any]]:
+        """Fetch payment methods for a cache miss and store them."""
+        methods = await self._fetch_payment_methods(amount)
+        self._store_payment_methods(key, methods)
+        return methods
+
+    def _store_payment_methods(
+        self, key: Optional[Tuple[str, str]], methods: List[Dict[str, Any]]
+    ) -> None:
+        """Cache a payment methods list, evicting the least recently used entry."""
+        self._methods_cache[key] = (time.monotonic(), methods)
+        self._methods_cache.move_to_end(key)
+        while len(self._methods_cache) > PAYMENT_METHODS_CACHE_SIZE:
+            evicted, _ = self._methods_cache.popitem(last=False)
+            self._methods_etags.pop(evicted, None)
+
+    async def _refresh_payment_methods(
+        self, key: Optional[Tuple[str, str]], amount: Optional[MollieAmount]
+    ) -> None:
+        """Refresh a cached payment methods entry off the request path."""
+        try:
+            methods = await self._fetch_payment_methods(amount)
+            self._store_payment_methods(key, methods)
+        except MollieServiceError as e:
+            # Keep serving the cached entry until it expires
+            logger.warning("Background payment methods refresh failed", error=str(e))
+        finally:
+            self._methods_refreshing.discard(key)
+
+    def start_background_refresh(self) -> None:
+        """
+        Keep the default (amount-less) payment methods entry warm.
+
+        Started from the application lifespan so the checkout path finds a
+        fresh cache instead of paying for the API call after each expiry.
+        """
+        if self.disabled or self._refresh_task is not None:
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_background_refresh(self) -> None:
+        """Cancel the background refresh task."""
+        if self._refresh_task is None:
+            return
+        self._refresh_task.cancel()
+        try:
+            await self._refresh_task
+        except asyncio.CancelledError:
+            pass
+        self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        """Refresh payment methods every 80% of the TTL, backing off on errors."""
+        backoff = 1
+        while True:
+            try:
+                methods = await self._fetch_payment_methods()
+                self._store_payment_methods(None, methods)
+                backoff = 1
+                await asyncio.sleep(PAYMENT_METHODS_CACHE_TTL * 0.8)
+            except MollieServiceError as e:
+                logger.warning(
+                    "Payment methods refresh failed", error=str(e), retry_in=backoff
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    async def _fetch_payment_methods(self, amount: Optional[MollieAmount] = None) -> List[Dict[str, Any]]:
+        """Fetch payment methods from the Mollie API and add Danish details."""
         try:
             params = {}
             if amount:
@@ -705,11 +873,28 @@ class MollieService:
             # Add locale for Danish payment methods
             params['locale'] = 'da_DK'
 
-            response_data = await self._make_request(
+            # Revalidate the cached list instead of downloading it again;
+            # an unchanged list comes back as an empty 304.
+            key = (amount.value, amount.currency) if amount else None
+            cached = self._methods_cache.get(key)
+            etag = self._methods_etags.get(key)
+            headers = {"If-None-Match": etag} if etag and cached is not None else None
+
+            response = await self._send_request(
                 method="GET",
                 endpoint="methods",
-                params=params
+                params=params,
+                headers=headers
             )
+            if response.status_code == 304 and cached is not None:
+                return cached[1]
+
+            response_data = self._parse_response(response)
+            etag = response.headers.get("etag")
+            if etag:
+                self._methods_etags[key] = etag
+            else:
+                self._methods_etags.pop(key, None)
 
             methods = response_data.get('_embedded', {}).get('methods', [])
 
@@ -759,17 +944,16 @@ class MollieService:
             methods = await self.list_payment_methods(mollie_amount)
 
             # Filter and enhance for Danish market
-            danish_methods = []
-            preferred_methods = ['mobilepay', 'creditcard', 'applepay', 'klarna']
-
-            for method_id in preferred_methods:
-                method_data = next((m for m in methods if m['id'] == method_id), None)
-                if method_data:
-                    danish_methods.append(method_data)
+            methods_by_id = {m['id']: m for m in methods}
+            danish_methods = [
+                methods_by_id[method_id]
+                for method_id in DANISH_PREFERRED_METHODS
+                if method_id in methods_by_id
+            ]
 
             # Add remaining methods
             for method in methods:
-                if method['id'] not in preferred_methods:
+                if method['id'] not in _DANISH_PREFERRED_SET:
                     danish_methods.append(method)
 
             logger.info("Retrieved Danish payment methods", count=len(danish_methods))
@@ -88,6 +88,9 @@ async def apply_database_functions():
         "CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs (created_at)",
         "CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs (action)",
 
+        # Expression index backing the LOWER(email) lookup in authenticate_user
+        "CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users (LOWER(email))",
+
         # Create authenticate user function
         """
         CREATE OR REPLACE FUNCTION authenticate_user(
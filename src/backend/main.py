@@ -14,6 +14,7 @@ import time
 from contextlib import asynccontextmanager
 from typing import Dict
 
+import httpx
 import structlog
 from fastapi import FastAPI, HTTPException, Request, status, WebSocket
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -38,9 +39,11 @@ from app.api.v1.endpoints import (
     monitoring
 )
 from app.middleware.enhanced_security import (
+    SecurityAuditor,
     SecurityHeadersMiddleware,
     IPFilterMiddleware,
-    RequestSizeMiddleware
+    RequestSizeMiddleware,
+    rate_limiter
 )
 from app.utils.enhanced_errors import (
     handle_validation_error,
@@ -51,27 +54,14 @@ from app.utils.enhanced_errors import (
     ValidationException
 )
 from pydantic import ValidationError
+from app.auth.auth import calibrate_bcrypt_rounds
 from app.core.config import settings
 from app.core.database import close_db, db_health, init_db
+from app.core.logging import configure_logging, stop_logging
+from app.services.mollie_service import MOLLIE_API_TIMEOUT, mollie_service
 
 # Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+configure_logging()
 
 logger = structlog.get_logger(__name__)
 
@@ -80,7 +70,7 @@ limiter = Limiter(key_func=get_remote_address)
 
 
 @asynccontextmanager
-async def lifespan(_: FastAPI):
+async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     logger.info("Starting Loctician Booking API", version=settings.PROJECT_VERSION)
@@ -97,6 +87,22 @@ async def lifespan(_: FastAPI):
             logger.error("Database health check failed")
             raise Exception("Database health check failed")
 
+        # Tune bcrypt cost to this host before serving logins
+        calibrate_bcrypt_rounds()
+
+        # One pooled HTTP client for outbound API calls
+        app.state.http_client = httpx.AsyncClient(
+            timeout=MOLLIE_API_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=20),
+        )
+        mollie_service.http_client = app.state.http_client
+
+        # Keep the payment methods cache warm off the request path
+        mollie_service.start_background_refresh()
+
+        # Batch security event inserts off the request path
+        SecurityAuditor.start_event_flusher()
+
         logger.info("Application startup completed")
 
     except Exception as e:
@@ -108,6 +114,13 @@ async def lifespan(_: FastAPI):
     # Shutdown
     logger.info("Shutting down Loctician Booking API")
 
+    await mollie_service.stop_background_refresh()
+    await SecurityAuditor.stop_event_flusher()
+    await rate_limiter.close()
+
+    mollie_service.http_client = None
+    await app.state.http_client.aclose()
+
     try:
         await close_db()
         logger.info("Database connections closed")
@@ -116,6 +129,9 @@ async def lifespan(_: FastAPI):
 
     logger.info("Application shutdown completed")
 
+    # Drain queued log output before the process exits
+    stop_logging()
+
 
 # Create FastAPI application
 app = FastAPI(
@@ -416,6 +432,8 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
+        # Picks uvloop when installed (see requirements.txt), else asyncio
+        loop="auto",
         log_level=settings.LOG_LEVEL.lower(),
         access_log=True,
     )
@@ -64,6 +64,10 @@ EXCEPTION
 END;
 $$ LANGUAGE plpgsql;
 
+-- Expression index so the case-insensitive email lookup in authenticate_user
+-- is an index seek instead of a sequential scan computing LOWER() per row
+CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users (LOWER(email));
+
 -- Function to authenticate users
 CREATE OR REPLACE FUNCTION authenticate_user(
     p_email VARCHAR(255),
@@ -8,9 +8,7 @@ import asyncio
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db_session, engine
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.auth.auth import AuthService
 
 async def fix_auth_system():
     """Apply temporary fix to authentication system"""
@@ -122,7 +120,7 @@ async def update_user_password():
 
     async with get_db_session() as db:
         # Hash the test password
-        hashed_password = pwd_context.hash("Password123#")
+        hashed_password = AuthService.get_password_hash("Password123#")
 
         # Update the user's password hash
         update_query = text("""
@@ -0,0 +1,427 @@
+"""
+Tests for JWT token handling in the authentication service.
+"""
+import uuid
+from datetime import timedelta
+from inspect import signature
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from jose import JWTError, jwt
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
+
+from app.auth import dependencies as dependencies_module
+from app.auth.auth import (
+    AuthenticationError,
+    AuthService,
+    _load_db_json,
+    calibrate_bcrypt_rounds,
+)
+from app.auth.dependencies import (
+    RoleChecker,
+    get_current_user,
+    get_optional_user,
+    get_optional_user_ro,
+    invalidate_user_tokens,
+    rate_limit_check,
+    require_admin,
+)
+from app.core.config import settings
+from app.core.database import get_db_ro
+from app.middleware import enhanced_security
+from app.middleware.enhanced_security import RateLimiter
+from app.models.enums import UserRole
+
+
+class TestTokenVerification:
+    """Test JWT creation and verification."""
+
+    def test_access_token_round_trip(self):
+        """Test that a freshly minted access token verifies."""
+        token = AuthService.create_access_token({"sub": "user-1", "role": "customer"})
+
+        payload = AuthService.verify_token(token)
+
+        assert payload["sub"] == "user-1"
+        assert payload["role"] == "customer"
+        assert payload["type"] == "access"
+
+    def test_token_timestamps_are_integer_epochs(self):
+        """Test that iat/exp are emitted as integer NumericDates."""
+        token = AuthService.create_access_token(
+            {"sub": "user-1"}, expires_delta=timedelta(minutes=5)
+        )
+        claims = jwt.get_unverified_claims(token)
+
+        assert isinstance(claims["iat"], int)
+        assert claims["exp"] - claims["iat"] == 300
+
+        refresh_claims = jwt.get_unverified_claims(
+            AuthService.create_refresh_token({"sub": "user-1"})
+        )
+        assert (
+            refresh_claims["exp"] - refresh_claims["iat"]
+            == settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        )
+
+    def test_refresh_token_requires_refresh_type(self):
+        """Test that token types are not interchangeable."""
+        token = AuthService.create_refresh_token({"sub": "user-1"})
+
+        assert AuthService.verify_token(token, "refresh")["sub"] == "user-1"
+        with pytest.raises(AuthenticationError):
+            AuthService.verify_token(token, "access")
+
+    def test_tokens_are_compatible_with_jose(self):
+        """Test that tokens interoperate with a standard JWT library."""
+        token = AuthService.create_access_token({"sub": "user-1"})
+        decoded = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        assert decoded["sub"] == "user-1"
+
+        foreign = jwt.encode(
+            {"sub": "user-2", "type": "access"},
+            settings.SECRET_KEY,
+            algorithm=settings.ALGORITHM,
+        )
+        assert AuthService.verify_token(foreign)["sub"] == "user-2"
+
+    def test_non_canonical_header_is_checked(self):
+        """Test that headers differing from ours are decoded and still accepted."""
+        token = jwt.encode(
+            {"sub": "user-3", "type": "access"},
+            settings.SECRET_KEY,
+            algorithm=settings.ALGORITHM,
+            headers={"kid": "primary"},
+        )
+
+        assert AuthService.verify_token(token)["sub"] == "user-3"
+
+    def test_expired_token_rejected(self):
+        """Test that expired tokens are rejected."""
+        token = AuthService.create_access_token(
+            {"sub": "user-1"}, expires_delta=timedelta(seconds=-10)
+        )
+
+        with pytest.raises(AuthenticationError):
+            AuthService.verify_token(token)
+
+    @pytest.mark.parametrize(
+        "claims",
+        [
+            {"nbf": 4102444800},
+            {"nbf": "soon"},
+            {"iat": "yesterday"},
+            {"aud": "another-service"},
+        ],
+    )
+    def test_invalid_registered_claims_rejected(self, claims):
+        """Test that nbf, iat and aud are validated like jwt.decode does."""
+        token = jwt.encode(
+            {"sub": "user-1", "type": "access", **claims},
+            settings.SECRET_KEY,
+            algorithm=settings.ALGORITHM,
+        )
+
+        with pytest.raises(JWTError):
+            jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with pytest.raises(AuthenticationError):
+            AuthService.verify_token(token)
+
+    def test_tampered_signature_rejected(self):
+        """Test that a modified payload fails signature verification."""
+        token = AuthService.create_access_token({"sub": "user-1"})
+        header, _, signature = token.split(".")
+        forged_payload = AuthService.create_access_token({"sub": "admin"}).split(".")[1]
+
+        with pytest.raises(AuthenticationError):
+            AuthService.verify_token(f"{header}.{forged_payload}.{signature}")
+
+    @pytest.mark.parametrize(
+        "token",
+        ["", "not-a-token", "a.b", "a.b.c.d", "ÿÿ.ÿÿ.ÿÿ", "e30.e30.", "e30.e30.e30."],
+    )
+    def test_malformed_tokens_rejected(self, token):
+        """Test that malformed tokens raise an authentication error."""
+        with pytest.raises(AuthenticationError):
+            AuthService.verify_token(token)
+
+    def test_unexpected_algorithm_rejected(self):
+        """Test that tokens signed with a different algorithm are rejected."""
+        token = jwt.encode(
+            {"sub": "user-1", "type": "access"}, settings.SECRET_KEY, algorithm="HS512"
+        )
+
+        with pytest.raises(AuthenticationError):
+            AuthService.verify_token(token)
+
+
+class TestDatabaseResults:
+    """Test decoding of PostgreSQL function results."""
+
+    @pytest.mark.parametrize(
+        "value",
+        ['{"success": true, "user_id": "abc"}', b'{"success": true, "user_id": "abc"}'],
+    )
+    def test_json_text_is_decoded(self, value):
+        """Test that JSON returned as text or bytes is decoded."""
+        assert _load_db_json(value) == {"success": True, "user_id": "abc"}
+
+    def test_decoded_values_pass_through(self):
+        """Test that jsonb results already decoded by the driver are untouched."""
+        result = {"valid": True}
+        assert _load_db_json(result) is result
+
+    def test_non_strict_json_falls_back_to_stdlib(self):
+        """Test that values orjson rejects are still decoded."""
+        assert _load_db_json('{"remaining": NaN}')["remaining"] != 0
+
+    async def test_user_row_is_hydrated_without_pending_changes(self):
+        """Test that a user loaded from a raw row carries no change history."""
+        row = MagicMock()
+        row._mapping = {"id": "user-1", "email": "a@example.com", "first_name": "Ada"}
+        result = MagicMock()
+        result.fetchone.return_value = row
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        user = await AuthService.get_user_by_id(db, "user-1")
+
+        assert user.id == "user-1"
+        assert user.email == "a@example.com"
+        assert not inspect(user).attrs.email.history.has_changes()
+
+
+class TestAuthenticateUserDb:
+    """Test error mapping in database-backed authentication."""
+
+    @staticmethod
+    def _db_returning(value):
+        result = MagicMock()
+        result.scalar.return_value = value
+        db = AsyncMock()
+        db.execute.return_value = result
+        return db
+
+    async def test_invalid_credentials_map_to_401(self):
+        """Test that rejected credentials are not turned into a 500."""
+        db = self._db_returning(
+            '{"success": false, "error": "INVALID_CREDENTIALS", "message": "Invalid email or password"}'
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await AuthService.authenticate_user_db(db, "a@b.dk", "pw", "127.0.0.1")
+
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_locked_account_maps_to_423(self):
+        """Test that locked accounts keep their status code."""
+        db = self._db_returning({"success": False, "error": "ACCOUNT_LOCKED", "message": "Locked"})
+
+        with pytest.raises(HTTPException) as exc_info:
+            await AuthService.authenticate_user_db(db, "a@b.dk", "pw", "127.0.0.1")
+
+        assert exc_info.value.status_code == status.HTTP_423_LOCKED
+
+    async def test_unknown_error_code_maps_to_500(self):
+        """Test that unexpected function errors do not leak their message."""
+        db = self._db_returning({"success": False, "error": "SYSTEM_ERROR", "message": "boom"})
+
+        with pytest.raises(HTTPException) as exc_info:
+            await AuthService.authenticate_user_db(db, "a@b.dk", "pw", "127.0.0.1")
+
+        assert exc_info.value.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert exc_info.value.detail == "Authentication system error"
+
+    async def test_database_failure_maps_to_500(self):
+        """Test that driver errors surface as an authentication system error."""
+        db = AsyncMock()
+        db.execute.side_effect = OperationalError("SELECT 1", {}, Exception("down"))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await AuthService.authenticate_user_db(db, "a@b.dk", "pw", "127.0.0.1")
+
+        assert exc_info.value.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    async def test_successful_authentication_returns_result(self):
+        """Test that a successful result is returned decoded."""
+        db = self._db_returning('{"success": true, "user_id": "u1", "role": "customer"}')
+
+        result = await AuthService.authenticate_user_db(db, "a@b.dk", "pw", "127.0.0.1")
+
+        assert result["user_id"] == "u1"
+
+
+class TestPasswordHashing:
+    """Test bcrypt hashing and the verify cache."""
+
+    def test_hash_round_trip(self):
+        """Test that a hashed password verifies and a wrong one does not."""
+        hashed = AuthService.get_password_hash("correct horse")
+        assert hashed.startswith("$2b$")
+        assert AuthService.verify_password("correct horse", hashed)
+        assert not AuthService.verify_password("wrong horse", hashed)
+
+    def test_malformed_hash_is_rejected(self):
+        """Test that a non-bcrypt hash fails verification instead of raising."""
+        assert not AuthService.verify_password("anything", "not-a-bcrypt-hash")
+
+    def test_calibration_stays_within_bounds(self):
+        """Test that calibration picks a cost within the configured range."""
+        rounds = calibrate_bcrypt_rounds()
+        assert settings.BCRYPT_MIN_ROUNDS <= rounds <= settings.BCRYPT_MAX_ROUNDS
+
+
+class TestCurrentUserCache:
+    """Test the verified-token cache in get_current_user."""
+
+    @staticmethod
+    def _user_row(user_id):
+        row = MagicMock()
+        row._mapping = {"id": user_id, "email": "c@example.com", "status": "active", "deleted_at": None}
+        result = MagicMock()
+        result.fetchone.return_value = row
+        return result
+
+    async def test_repeat_requests_skip_user_lookup(self):
+        """Test that a cached token does not re-query the user."""
+        token = AuthService.create_access_token({"sub": "cached-user"})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        db = AsyncMock()
+        db.execute.return_value = self._user_row("cached-user")
+
+        first = await get_current_user(MagicMock(), credentials, db)
+        calls_after_first = db.execute.await_count
+        second = await get_current_user(MagicMock(), credentials, db)
+
+        assert first.id == second.id == "cached-user"
+        assert first is not second
+        assert db.execute.await_count == calls_after_first
+
+    async def test_invalidation_forces_lookup(self):
+        """Test that invalidating a user's tokens drops their cache entries."""
+        token = AuthService.create_access_token({"sub": "logout-user"})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        db = AsyncMock()
+        db.execute.return_value = self._user_row("logout-user")
+
+        await get_current_user(MagicMock(), credentials, db)
+        invalidate_user_tokens("logout-user")
+
+        assert dependencies_module._get_cached_token(token) is None
+
+    async def test_invalidation_accepts_uuid_ids(self):
+        """Test that a UUID user id (as raw rows return it) matches the str subject."""
+        user_id = uuid.uuid4()
+        token = AuthService.create_access_token({"sub": str(user_id)})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        db = AsyncMock()
+        db.execute.return_value = self._user_row(user_id)
+
+        user = await get_current_user(MagicMock(), credentials, db)
+        invalidate_user_tokens(user.id)
+
+        assert dependencies_module._get_cached_token(token) is None
+
+    async def test_optional_user_is_none_for_bad_token(self):
+        """Test that an invalid token makes the request anonymous."""
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not.a.token")
+
+        assert await get_optional_user(MagicMock(), credentials, AsyncMock()) is None
+
+    async def test_read_only_optional_user_uses_read_only_session(self):
+        """Test that read-only routes resolve the optional user on get_db_ro."""
+        db_param = signature(get_optional_user_ro).parameters["db"]
+        assert db_param.default.dependency is get_db_ro
+
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not.a.token")
+        assert await get_optional_user_ro(MagicMock(), credentials, AsyncMock()) is None
+
+    async def test_bad_token_raises_401_with_reason(self):
+        """Test that get_current_user still reports why a token was rejected."""
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not.a.token")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(MagicMock(), credentials, AsyncMock())
+
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+        assert exc_info.value.detail == "Invalid token"
+        assert exc_info.value.headers == {"WWW-Authenticate": "Bearer"}
+
+
+class TestRoleChecker:
+    """Test role-based access checks."""
+
+    def test_allows_listed_roles(self):
+        """Test that users with an allowed role pass, including raw role values."""
+        checker = RoleChecker([UserRole.STAFF, UserRole.ADMIN])
+
+        assert checker.check(MagicMock(role=UserRole.ADMIN)).role == UserRole.ADMIN
+        assert checker.check(MagicMock(role="staff")).role == "staff"
+
+    def test_denies_other_roles(self):
+        """Test that other roles get a 403 naming the required roles."""
+        checker = RoleChecker([UserRole.ADMIN])
+
+        with pytest.raises(HTTPException) as exc_info:
+            checker.check(MagicMock(role=UserRole.CUSTOMER))
+
+        assert exc_info.value.status_code == status.HTTP_403_FORBIDDEN
+        assert exc_info.value.detail == "Access denied. Required roles: ['admin']"
+
+    def test_role_dependencies_honour_current_user_override(self):
+        """Test that overriding get_current_user applies to role-protected routes."""
+        app = FastAPI()
+
+        @app.get("/admin")
+        async def admin_only(user=Depends(require_admin)):
+            return {"role": user.role.value}
+
+        app.dependency_overrides[get_current_user] = lambda: MagicMock(
+            role=UserRole.ADMIN, is_active=True
+        )
+
+        response = TestClient(app).get("/admin")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"role": "admin"}
+
+
+class TestRateLimit:
+    """Test that rate_limit_check uses the shared application rate limiter."""
+
+    @staticmethod
+    def _request(client_ip, path="/api/v1/auth/login"):
+        return Request({
+            "type": "http",
+            "method": "POST",
+            "path": path,
+            "headers": [],
+            "query_string": b"",
+            "client": (client_ip, 1234),
+            "server": ("testserver", 80),
+            "scheme": "http",
+        })
+
+    async def test_rejects_when_limit_spent(self, monkeypatch):
+        """Test that a client is limited with a 429 once its budget is spent."""
+        monkeypatch.setattr(enhanced_security, "rate_limiter", RateLimiter())
+
+        for _ in range(settings.RATE_LIMIT_PER_MINUTE):
+            await rate_limit_check(self._request("203.0.113.9"), None)
+        with pytest.raises(HTTPException) as exc_info:
+            await rate_limit_check(self._request("203.0.113.9"), None)
+
+        assert exc_info.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    async def test_keys_are_limited_independently(self, monkeypatch):
+        """Test that one client's usage does not affect another's."""
+        monkeypatch.setattr(enhanced_security, "rate_limiter", RateLimiter())
+
+        for _ in range(settings.RATE_LIMIT_PER_MINUTE):
+            await rate_limit_check(self._request("203.0.113.10"), None)
+
+        await rate_limit_check(self._request("203.0.113.11"), None)
@@ -4,6 +4,8 @@ Tests the complete payment flow including webhooks, subscriptions, and error han
 """
 import asyncio
 import json
+import time
+import httpx
 import pytest
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -16,7 +18,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.main import app
 from app.core.database import get_db
-from app.services.mollie_service import mollie_service, MollieAPIError
+from app.services.mollie_service import (
+    PAYMENT_METHODS_CACHE_SIZE,
+    PAYMENT_METHODS_CACHE_TTL,
+    MollieAPIError,
+    MollieService,
+    mollie_service,
+)
 from app.schemas.mollie_payment import (
     MolliePaymentCreate,
     MolliePaymentResponse,
@@ -228,6 +236,109 @@ class TestMollieService:
         assert url == "https://www.mollie.com/payscreen/select-method/WDqYK6vllg"
 
 
+class TestPaymentMethodsCache:
+    """Test caching of the Mollie payment methods list."""
+
+    METHODS_RESPONSE = {
+        "_embedded": {
+            "methods": [{"id": "ideal"}, {"id": "creditcard"}, {"id": "mobilepay"}]
+        }
+    }
+
+    def _methods_response(self, status_code=200, etag='"v1"'):
+        request = httpx.Request("GET", "https://api.mollie.com/v2/methods")
+        if status_code == 304:
+            return httpx.Response(304, headers={"ETag": etag}, request=request)
+        return httpx.Response(
+            status_code, json=self.METHODS_RESPONSE, headers={"ETag": etag}, request=request
+        )
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_api_call(self):
+        """Test that concurrent cache misses result in a single API call."""
+        service = MollieService(api_key="test_cache")
+        with patch.object(service, '_send_request', new_callable=AsyncMock) as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response()
+
+            results = await asyncio.gather(
+                *(service.list_payment_methods() for _ in range(5))
+            )
+
+            assert mock_request.await_count == 1
+            assert all(r[0]["id"] == "mobilepay" for r in results)
+
+    @pytest.mark.asyncio
+    async def test_amount_entries_are_bounded(self):
+        """Test that per-amount entries are evicted least recently used first."""
+        service = MollieService(api_key="test_cache")
+        with patch.object(service, '_send_request', new_callable=AsyncMock) as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response()
+
+            for i in range(PAYMENT_METHODS_CACHE_SIZE + 1):
+                await service.list_payment_methods(MollieAmount(currency="DKK", value=f"{i}.00"))
+
+            assert len(service._methods_cache) == PAYMENT_METHODS_CACHE_SIZE
+            assert ("0.00", "DKK") not in service._methods_cache
+
+    @pytest.mark.asyncio
+    async def test_returned_methods_do_not_share_cached_dicts(self):
+        """Test that callers mutating the result do not change the cache."""
+        service = MollieService(api_key="test_cache")
+        with patch.object(service, '_send_request', new_callable=AsyncMock) as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response()
+
+            first = await service.list_payment_methods()
+            first[0]["id"] = "changed"
+            second = await service.list_payment_methods()
+
+            assert second[0]["id"] == "mobilepay"
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_are_refetched(self):
+        """Test that entries older than the TTL are fetched again."""
+        service = MollieService(api_key="test_cache")
+        with patch.object(service, '_send_request', new_callable=AsyncMock) as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response()
+
+            await service.list_payment_methods()
+            fetched_at, methods = service._methods_cache[None]
+            service._methods_cache[None] = (fetched_at - PAYMENT_METHODS_CACHE_TTL, methods)
+            await service.list_payment_methods()
+
+            assert mock_request.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_background_refresh_warms_cache(self):
+        """Test that the background refresh fills the default entry."""
+        service = MollieService(api_key="test_cache")
+        with patch.object(service, '_send_request', new_callable=AsyncMock) as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response()
+
+            service.start_background_refresh()
+            await asyncio.sleep(0)
+            await service.stop_background_refresh()
+
+            assert None in service._methods_cache
+            assert service._refresh_task is None
+
+    @pytest.mark.asyncio
+    async def test_refresh_revalidates_with_etag(self):
+        """Test that an expired entry is revalidated and kept on 304."""
+        service = MollieService(api_key="test_cache")
+        with patch.object(service, '_send_request', new_callable=AsyncMock) as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response()
+            first = await service.list_payment_methods()
+
+            fetched_at, methods = service._methods_cache[None]
+            service._methods_cache[None] = (fetched_at - PAYMENT_METHODS_CACHE_TTL, methods)
+            mock_request.side_effect = lambda *args, **kwargs: self._methods_response(304)
+            second = await service.list_payment_methods()
+
+            assert mock_request.await_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+            assert second == first
+            assert time.monotonic() - service._methods_cache[None][0] < PAYMENT_METHODS_CACHE_TTL
+
+
 class TestPaymentEndpoints:
     """Test payment API endpoints."""
 
@@ -0,0 +1,14 @@
+-- Migration 012: Security Event Lookup Indexes
+-- PostgreSQL 17 Security and Compliance Infrastructure
+-- Created: 2026-10-17
+-- Index for the per-IP failed login check in the security middleware
+
+-- =====================================================
+-- SECURITY EVENT INDEXES
+-- =====================================================
+
+-- Recent failed logins per IP (SecurityAuditor.check_suspicious_activity);
+-- partial so only the queried event type is indexed
+CREATE INDEX CONCURRENTLY idx_security_events_failed_login_ip_time
+ON security_events (ip_address, created_at DESC)
+WHERE event_type = 'failed_login';
@@ -0,0 +1,23 @@
+-- Migration 013: Booking Overlap Exclusion Constraint
+-- PostgreSQL 17 Booking Integrity
+-- Created: 2026-10-17
+-- Let the database reject overlapping bookings for a loctician
+
+-- =====================================================
+-- DOUBLE-BOOKING PREVENTION
+-- =====================================================
+
+-- No two non-cancelled bookings of one loctician may overlap. The check in
+-- check_availability() runs before the INSERT, so two concurrent bookings
+-- could both pass it; the constraint closes that race atomically, and its
+-- GiST index serves range overlap lookups. Requires btree_gist (migration
+-- 001) and fails if overlapping bookings already exist.
+ALTER TABLE bookings
+ADD CONSTRAINT no_double_booking
+EXCLUDE USING gist (
+    loctician_id WITH =,
+    tstzrange(appointment_start, appointment_end) WITH &&
+)
+WHERE (status NOT IN ('cancelled'));
+
+COMMENT ON CONSTRAINT no_double_booking ON bookings IS 'Prevents overlapping active bookings for the same loctician';
@@ -0,0 +1,16 @@
+-- Migration 014: Booking Search Indexes
+-- PostgreSQL 17 Search Optimization
+-- Created: 2026-10-17
+-- Index the booking number substring match used by search_bookings()
+
+-- =====================================================
+-- BOOKING SEARCH INDEXES
+-- =====================================================
+
+-- search_bookings() matches booking_number with ILIKE '%term%', which no
+-- btree (including the unique one) can serve; a trigram GIN index can.
+-- Requires pg_trgm (migration 001).
+CREATE INDEX CONCURRENTLY idx_bookings_booking_number_trgm
+ON bookings USING gin (booking_number gin_trgm_ops);
+
+COMMENT ON INDEX idx_bookings_booking_number_trgm IS 'Substring and case-insensitive booking number search';
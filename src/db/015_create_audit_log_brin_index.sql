@@ -0,0 +1,20 @@
+-- Migration 015: Audit Log Time Index
+-- PostgreSQL 17 Performance Optimization
+-- Created: 2026-10-17
+-- Index the append-only audit_log by time with BRIN instead of btree
+
+-- =====================================================
+-- AUDIT LOG INDEXES
+-- =====================================================
+
+-- audit_log rows are only ever appended by audit_trigger_function(), so
+-- created_at follows the physical row order and a BRIN index covers time
+-- range scans at a tiny fraction of a btree's size and insert cost.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_created_at_brin
+ON audit_log USING brin (created_at) WITH (pages_per_range = 32);
+
+-- Superseded: a btree partial index whose NOW()-based predicate froze at
+-- creation time (performance_optimization.sql)
+DROP INDEX CONCURRENTLY IF EXISTS idx_audit_log_date_user;
+
+COMMENT ON INDEX idx_audit_log_created_at_brin IS 'Time range scans over the append-only audit log';
@@ -0,0 +1,56 @@
+-- Migration 016: Audit Trigger Diffing
+-- PostgreSQL 17 Security and Compliance Infrastructure
+-- Created: 2026-10-17
+-- Record changed fields and the acting user in the audit trigger
+
+-- =====================================================
+-- AUDIT TRIGGER
+-- =====================================================
+
+-- changed_fields is diffed from OLD and NEW inside the trigger, and the
+-- acting user is read from the transaction-local app.current_user_id that
+-- the application sets for row level security, so audit rows are complete
+-- without the application reading or diffing anything.
+CREATE OR REPLACE FUNCTION audit_trigger_function()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_old JSONB;
+    v_new JSONB;
+    v_user_id UUID := NULLIF(current_setting('app.current_user_id', true), '')::UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- A user deleting their own account cannot be referenced any more
+        IF TG_TABLE_NAME = 'users' AND v_user_id = OLD.id THEN
+            v_user_id := NULL;
+        END IF;
+        INSERT INTO audit_log (table_name, record_id, action, old_values, user_id)
+        VALUES (TG_TABLE_NAME, OLD.id, 'DELETE', to_jsonb(OLD), v_user_id);
+        RETURN OLD;
+    ELSIF TG_OP = 'UPDATE' THEN
+        v_old := to_jsonb(OLD);
+        v_new := to_jsonb(NEW);
+        INSERT INTO audit_log (table_name, record_id, action, old_values, new_values, changed_fields, user_id)
+        VALUES (
+            TG_TABLE_NAME, NEW.id, 'UPDATE', v_old, v_new,
+            ARRAY(
+                SELECT key FROM jsonb_each(v_new)
+                WHERE v_new -> key IS DISTINCT FROM v_old -> key
+            ),
+            v_user_id
+        );
+        RETURN NEW;
+    ELSIF TG_OP = 'INSERT' THEN
+        INSERT INTO audit_log (table_name, record_id, action, new_values, user_id)
+        VALUES (TG_TABLE_NAME, NEW.id, 'INSERT', to_jsonb(NEW), v_user_id);
+        RETURN NEW;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Audit rows now reference the acting user; keep them when a user is
+-- removed by the retention cleanup instead of blocking the delete
+ALTER TABLE audit_log
+    DROP CONSTRAINT IF EXISTS audit_log_user_id_fkey,
+    ADD CONSTRAINT audit_log_user_id_fkey
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL;
@@ -0,0 +1,18 @@
+-- Migration 017: CMS Publication Indexes
+-- PostgreSQL 17 Performance Optimization
+-- Created: 2026-10-17
+-- Index the publication window of published CMS pages
+
+-- =====================================================
+-- CMS PAGE INDEXES
+-- =====================================================
+
+-- Published page listings filter on is_published and compare the bare
+-- publish_at / unpublish_at columns with now() (CMSPage.is_currently_published
+-- in SQL); partial so drafts are not indexed. Slug lookups use the unique
+-- constraint's index.
+CREATE INDEX CONCURRENTLY idx_cms_pages_publication_window
+ON cms_pages (publish_at, unpublish_at)
+WHERE is_published = TRUE;
+
+COMMENT ON INDEX idx_cms_pages_publication_window IS 'Currently published CMS page lookups';
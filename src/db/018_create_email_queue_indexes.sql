@@ -0,0 +1,27 @@
+-- Migration 018: Email Queue Indexes
+-- PostgreSQL 17 Performance Optimization
+-- Created: 2026-10-17
+-- Index the email worker dequeue and the admin queue listings
+
+-- =====================================================
+-- EMAIL QUEUE INDEXES
+-- =====================================================
+
+-- The worker selects due entries with status IN ('queued', 'failed') and
+-- attempts < max_attempts ordered by scheduled_at. The predicate matches
+-- the query literally so the planner can use this partial index for the
+-- range scan and the ordering; sent and bounced rows are never indexed.
+CREATE INDEX CONCURRENTLY idx_email_queue_due
+ON email_queue (scheduled_at)
+WHERE status IN ('queued', 'failed');
+
+-- Superseded by idx_email_queue_due
+DROP INDEX CONCURRENTLY IF EXISTS idx_email_queue_status;
+
+-- Admin queue listings filter on status and order by created_at; the queue
+-- stats (oldest queued entry) and GDPR cleanup use the same columns.
+CREATE INDEX CONCURRENTLY idx_email_queue_status_created
+ON email_queue (status, created_at);
+
+COMMENT ON INDEX idx_email_queue_due IS 'Email worker dequeue of due queued/failed entries';
+COMMENT ON INDEX idx_email_queue_status_created IS 'Email queue listings by status and creation time';
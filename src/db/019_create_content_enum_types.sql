@@ -0,0 +1,34 @@
+-- Migration 019: Content Enum Types
+-- PostgreSQL 17 Schema Alignment
+-- Created: 2026-10-17
+-- Ensure the native enum types used by the CMS and email models exist
+
+-- =====================================================
+-- ENUM TYPES
+-- =====================================================
+
+-- Like migrations 012-021 as a whole, this targets databases built from
+-- schema.sql. The models map page_type, template_type and email_status onto
+-- these types by value and never create them; schema.sql does, so this is a
+-- no-op there and only restores a type that is missing. Existing types are
+-- left untouched.
+DO $$
+BEGIN
+    CREATE TYPE page_type AS ENUM ('page', 'blog_post', 'service_page', 'product_page', 'landing_page');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$
+BEGIN
+    CREATE TYPE template_type AS ENUM ('booking_confirmation', 'reminder', 'cancellation', 'welcome', 'marketing', 'invoice');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$
+BEGIN
+    CREATE TYPE email_status AS ENUM ('queued', 'sending', 'sent', 'failed', 'bounced');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
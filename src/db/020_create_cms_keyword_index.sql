@@ -0,0 +1,16 @@
+-- Migration 020: CMS Keyword Index
+-- PostgreSQL 17 Performance Optimization
+-- Created: 2026-10-17
+-- GIN index for keyword lookups on CMS pages
+
+-- =====================================================
+-- CMS PAGE INDEXES
+-- =====================================================
+
+-- meta_keywords is a TEXT[]; keyword and tag filters use the array
+-- operators (meta_keywords @> ARRAY['locs'], meta_keywords && ...), which
+-- the default GIN array opclass serves without scanning every page.
+CREATE INDEX CONCURRENTLY idx_cms_pages_meta_keywords
+ON cms_pages USING gin (meta_keywords);
+
+COMMENT ON INDEX idx_cms_pages_meta_keywords IS 'CMS page keyword containment lookups';
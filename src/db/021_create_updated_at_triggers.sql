@@ -0,0 +1,47 @@
+-- Migration 021: updated_at Triggers
+-- PostgreSQL 17 Performance Optimization
+-- Created: 2026-10-17
+-- Maintain updated_at in the database for every table whose model maps it
+
+-- =====================================================
+-- UPDATED_AT TRIGGERS
+-- =====================================================
+
+-- The models no longer send updated_at = now() with every UPDATE on
+-- PostgreSQL (UpdatedAtMixin); the BEFORE UPDATE trigger sets it instead.
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Some of these tables are created from the models rather than the SQL
+-- schema, so missing tables are skipped, as are tables that already have
+-- a trigger on this function (tr_*/update_*_updated_at).
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY[
+        'availability_overrides', 'availability_patterns', 'booking_products',
+        'booking_services', 'booking_state_changes', 'bookings', 'calendar_events',
+        'cms_pages', 'data_retention_policies', 'email_templates',
+        'product_categories', 'products', 'service_categories', 'services',
+        'user_profiles', 'users'
+    ]
+    LOOP
+        IF to_regclass(tbl) IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgrelid = to_regclass(tbl)
+            AND tgfoid = 'update_updated_at_column'::regproc
+        ) THEN
+            EXECUTE format(
+                'CREATE TRIGGER tr_%1$s_updated_at BEFORE UPDATE ON %1$I '
+                'FOR EACH ROW EXECUTE FUNCTION update_updated_at_column()',
+                tbl
+            );
+        END IF;
+    END LOOP;
+END $$;
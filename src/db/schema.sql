@@ -306,7 +306,13 @@ CREATE TABLE bookings (
     -- Constraints
     CHECK (appointment_start < appointment_end),
     CHECK (duration_minutes > 0),
-    CHECK (total_amount >= 0)
+    CHECK (total_amount >= 0),
+
+    -- Overlapping active bookings for one loctician are rejected atomically
+    CONSTRAINT no_double_booking EXCLUDE USING gist (
+        loctician_id WITH =,
+        tstzrange(appointment_start, appointment_end) WITH &&
+    ) WHERE (status NOT IN ('cancelled'))
 );
 
 -- Booking add-on services
@@ -349,7 +355,7 @@ CREATE TABLE audit_log (
     changed_fields TEXT[],
 
     -- User context
-    user_id UUID REFERENCES users(id),
+    user_id UUID REFERENCES users(id) ON DELETE SET NULL,
     session_id VARCHAR(100),
     ip_address INET,
     user_agent TEXT,
@@ -594,12 +600,14 @@ CREATE INDEX idx_calendar_events_time ON calendar_events USING gist(loctician_id
 -- Audit and analytics indexes
 CREATE INDEX idx_audit_log_table_record ON audit_log(table_name, record_id, created_at DESC);
 CREATE INDEX idx_daily_metrics_date ON daily_metrics(date DESC, loctician_id);
-CREATE INDEX idx_email_queue_status ON email_queue(status, scheduled_at) WHERE status IN ('queued', 'failed');
+CREATE INDEX idx_email_queue_due ON email_queue(scheduled_at) WHERE status IN ('queued', 'failed');
+CREATE INDEX idx_email_queue_status_created ON email_queue(status, created_at);
 
 -- Full-text search indexes
 CREATE INDEX idx_services_search ON services USING gin(to_tsvector('danish', name || ' ' || COALESCE(description, '')));
 CREATE INDEX idx_products_search ON products USING gin(to_tsvector('danish', name || ' ' || COALESCE(description, '')));
 CREATE INDEX idx_cms_pages_search ON cms_pages USING gin(to_tsvector('danish', title || ' ' || COALESCE(content, '')));
+CREATE INDEX idx_cms_pages_meta_keywords ON cms_pages USING gin(meta_keywords);
 
 -- =====================================================
 -- CRITICAL CONSTRAINTS FOR ANTI-DOUBLE-BOOKING
@@ -897,21 +905,39 @@ CREATE TRIGGER tr_products_updated_at BEFORE UPDATE ON products FOR EACH ROW EXE
 CREATE TRIGGER tr_bookings_updated_at BEFORE UPDATE ON bookings FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER tr_cms_pages_updated_at BEFORE UPDATE ON cms_pages FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- Trigger function for audit logging
+-- Trigger function for audit logging; diffs changed fields and records
+-- the transaction-local RLS user
 CREATE OR REPLACE FUNCTION audit_trigger_function()
 RETURNS TRIGGER AS $$
+DECLARE
+    v_old JSONB;
+    v_new JSONB;
+    v_user_id UUID := NULLIF(current_setting('app.current_user_id', true), '')::UUID;
 BEGIN
     IF TG_OP = 'DELETE' THEN
-        INSERT INTO audit_log (table_name, record_id, action, old_values)
-        VALUES (TG_TABLE_NAME, OLD.id, 'DELETE', to_jsonb(OLD));
+        -- A user deleting their own account cannot be referenced any more
+        IF TG_TABLE_NAME = 'users' AND v_user_id = OLD.id THEN
+            v_user_id := NULL;
+        END IF;
+        INSERT INTO audit_log (table_name, record_id, action, old_values, user_id)
+        VALUES (TG_TABLE_NAME, OLD.id, 'DELETE', to_jsonb(OLD), v_user_id);
         RETURN OLD;
     ELSIF TG_OP = 'UPDATE' THEN
-        INSERT INTO audit_log (table_name, record_id, action, old_values, new_values)
-        VALUES (TG_TABLE_NAME, NEW.id, 'UPDATE', to_jsonb(OLD), to_jsonb(NEW));
+        v_old := to_jsonb(OLD);
+        v_new := to_jsonb(NEW);
+        INSERT INTO audit_log (table_name, record_id, action, old_values, new_values, changed_fields, user_id)
+        VALUES (
+            TG_TABLE_NAME, NEW.id, 'UPDATE', v_old, v_new,
+            ARRAY(
+                SELECT key FROM jsonb_each(v_new)
+                WHERE v_new -> key IS DISTINCT FROM v_old -> key
+            ),
+            v_user_id
+        );
         RETURN NEW;
     ELSIF TG_OP = 'INSERT' THEN
-        INSERT INTO audit_log (table_name, record_id, action, new_values)
-        VALUES (TG_TABLE_NAME, NEW.id, 'INSERT', to_jsonb(NEW));
+        INSERT INTO audit_log (table_name, record_id, action, new_values, user_id)
+        VALUES (TG_TABLE_NAME, NEW.id, 'INSERT', to_jsonb(NEW), v_user_id);
         RETURN NEW;
     END IF;
     RETURN NULL;
@@ -356,6 +356,13 @@ BEGIN
     AND deleted_at IS NULL;
 
     IF NOT FOUND THEN
+        -- Run the same bcrypt work as a real password check against a fixed
+        -- cost-12 dummy hash, so unknown emails cannot be told apart from
+        -- wrong passwords by response time.
+        PERFORM verify_password(
+            p_password, '$2a$12$Y7/7W64SJGzPevNdmiCIou9TPV6gBcIAHSQT/1IunwbRfjk0TgCXW'
+        );
+
         -- Log failed attempt
         INSERT INTO login_attempts (email, ip_address, success, failure_reason, user_agent)
         VALUES (p_email, p_ip_address, FALSE, 'USER_NOT_FOUND', p_user_agent);
@@ -393,8 +400,12 @@ BEGIN
         NOW() + INTERVAL '8 hours'
     ) RETURNING id INTO session_id;
 
-    -- Update last login
-    UPDATE users SET last_login_at = NOW() WHERE id = user_record.id;
+    -- Update last login. last_login_at is informational only, so coalesce
+    -- bursts of logins into one write instead of rewriting the users row
+    -- (and taking its row lock) on every successful authentication.
+    UPDATE users SET last_login_at = NOW()
+    WHERE id = user_record.id
+    AND (last_login_at IS NULL OR last_login_at < NOW() - INTERVAL '5 minutes');
 
     -- Log successful attempt
     INSERT INTO login_attempts (email, ip_address, success, user_agent)
@@ -650,7 +661,7 @@ BEGIN
         );
 
     EXCEPTION
-        WHEN unique_violation THEN
+        WHEN unique_violation OR exclusion_violation THEN
             RETURN json_build_object(
                 'success', false,
                 'error', 'BOOKING_CONFLICT',